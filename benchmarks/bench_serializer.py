@@ -0,0 +1,68 @@
+"""Compare the node serializers on the nodes of a random trie.
+
+    python -m benchmarks.bench_serializer [--keys 20000] [--repeat 5]
+"""
+import argparse
+import random
+import timeit
+
+from serializer.fast_rlp import FastRLPSerializer
+from serializer.rlp import RLPSerializer
+from storage.ephem_db import EphemDB
+from trie.trie import Trie
+
+SERIALIZERS = [RLPSerializer, FastRLPSerializer]
+
+
+def random_bytes(size, rng=random):
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def build_nodes(count):
+    """encoded and decoded nodes of a trie of `count` random keys"""
+    trie = Trie(EphemDB())
+    trie.update_many({random_bytes(32): random_bytes(random.randint(1, 100))
+                      for _ in range(count)})
+    encoded = list(trie.db.db.values())
+    return encoded, [RLPSerializer.deserialize_to_node(e) for e in encoded]
+
+
+def best_time(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def run(keys, repeat):
+    """
+    :return: {serializer name: {operation: seconds}}
+    """
+    encoded, nodes = build_nodes(keys)
+    for serializer in SERIALIZERS:
+        assert [serializer.serialize_node(n) for n in nodes] == encoded
+    results = {}
+    for serializer in SERIALIZERS:
+        results[serializer.__name__] = {
+            'encode': best_time(
+                lambda: [serializer.serialize_node(n) for n in nodes], repeat),
+            'decode': best_time(
+                lambda: [serializer.deserialize_to_node(e) for e in encoded],
+                repeat),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keys', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.keys, args.repeat)
+    base = results[RLPSerializer.__name__]
+    for name, times in results.items():
+        print('{:<20} encode {:.3f}s ({:.1f}x)  decode {:.3f}s ({:.1f}x)'.format(
+            name, times['encode'], base['encode'] / times['encode'],
+            times['decode'], base['decode'] / times['decode']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""Benchmark the main operations of the trie and save the results as JSON.
+
+    python -m benchmarks.run [--sizes 10000 100000] [--output results.json]
+                             [--compare previous.json]
+
+Each dataset is built from a fixed seed so runs on different commits
+measure the same work. Times are the best of `--repeat` runs.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+
+from benchmarks.bench_serializer import random_bytes
+from serializer.fast_rlp import FastRLPSerializer
+from serializer.rlp import RLPSerializer
+from storage.ephem_db import EphemDB
+from trie.trie import Trie
+
+SERIALIZERS = {'rlp': RLPSerializer, 'fast': FastRLPSerializer}
+
+
+def random_keys(rng, size):
+    """random 32 byte keys, like hashed account addresses"""
+    return {random_bytes(32, rng): random_bytes(rng.randint(10, 100), rng)
+            for _ in range(size)}
+
+
+def prefixed_keys(rng, size):
+    """keys sharing prefixes, 1000 keys per prefix"""
+    prefixes = [b'prefix%05d:' % i for i in range(max(1, size // 1000))]
+    key_vals = {}
+    while len(key_vals) < size:
+        key = rng.choice(prefixes) + str(rng.randint(0, 10 ** 9)).encode()
+        key_vals[key] = random_bytes(rng.randint(10, 100), rng)
+    return key_vals
+
+
+DATASETS = {'random': random_keys, 'prefixed': prefixed_keys}
+
+
+def query_prefixes(dataset, key_vals, count):
+    if dataset == 'prefixed':
+        prefixes = sorted({key[:len(b'prefix00000:')] for key in key_vals})
+    else:
+        prefixes = [bytes((i,)) for i in range(256)]
+    return prefixes[:count]
+
+
+def best_time(func, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_dataset(dataset, size, args):
+    """
+    :return: list of results of the benchmarks on one dataset
+    """
+    rng = random.Random(args.seed)
+    key_vals = DATASETS[dataset](rng, size)
+    items = list(key_vals.items())
+    sample = rng.sample(items, min(args.sample, size))
+    sample_keys = [k for k, _ in sample]
+    serializer = SERIALIZERS[args.serializer]
+    trie = Trie(EphemDB(), node_serializer=serializer)
+    results = []
+
+    def record(name, ops, seconds):
+        results.append({'dataset': dataset, 'size': size, 'name': name,
+                        'ops': ops, 'seconds': seconds,
+                        'ops_per_sec': ops / seconds if seconds else None})
+
+    def build():
+        trie.set_root_hash(None)
+        trie.update_many(key_vals)
+
+    record('update_many', size, best_time(build, args.repeat))
+
+    new_values = [(k, v + b'.') for k, v in sample]
+    record('update', len(new_values), best_time(
+        lambda: [trie.update(k, v) for k, v in new_values], args.repeat,
+        setup=build))
+
+    record('get', len(sample_keys), best_time(
+        lambda: [trie.get(k) for k in sample_keys], args.repeat))
+
+    prefixes = query_prefixes(dataset, key_vals, args.prefix_queries)
+    record('get_keys_with_prefix', len(prefixes), best_time(
+        lambda: [trie.get_keys_with_prefix(p) for p in prefixes],
+        args.repeat))
+
+    record('get_proof', len(sample_keys), best_time(
+        lambda: [trie.get(k, with_proof=True) for k in sample_keys],
+        args.repeat))
+
+    root_hash, root_node = trie.root_hash, trie.root_node
+    proofs = []
+    for k, v in sample:
+        _, proof = trie.get(k, with_proof=True)
+        proofs.append((k, v, proof + [root_node]))
+    record('verify_proof_of_existence', len(proofs), best_time(
+        lambda: [Trie.verify_proof_of_existence(root_hash, k, v, p)
+                 for k, v, p in proofs], args.repeat))
+
+    groups = []
+    for i in range(0, len(sample), 16):
+        group = dict(sample[i:i + 16])
+        _, proof = trie.get_multi(group, with_proof=True)
+        groups.append((group, list(proof.values()) + [root_node]))
+    record('verify_proof_of_existence_multi_keys', len(groups), best_time(
+        lambda: [Trie.verify_proof_of_existence_multi_keys(root_hash, g, p)
+                 for g, p in groups], args.repeat))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous):
+    """print the ratio of the ops per second to the ones of a previous run"""
+    before = {(r['dataset'], r['size'], r['name']): r['ops_per_sec']
+              for r in previous['results']}
+    for r in results:
+        old = before.get((r['dataset'], r['size'], r['name']))
+        if old:
+            print('{dataset:<9} {size:>8} {name:<38}'.format(**r),
+                  '{:.2f}x'.format(r['ops_per_sec'] / old))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000])
+    parser.add_argument('--datasets', nargs='+', choices=sorted(DATASETS),
+                        default=sorted(DATASETS))
+    parser.add_argument('--serializer', choices=sorted(SERIALIZERS),
+                        default='rlp')
+    parser.add_argument('--sample', type=int, default=2000,
+                        help='number of keys read, updated and proven')
+    parser.add_argument('--prefix-queries', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to save the results to')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for dataset in args.datasets:
+            for r in run_dataset(dataset, size, args):
+                print('{dataset:<9} {size:>8} {name:<38} {ops_per_sec:>12.0f} '
+                      'ops/s'.format(**r))
+                results.append(r)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': vars(args),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
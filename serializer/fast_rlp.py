@@ -0,0 +1,109 @@
+from typing import Tuple
+
+from rlp import encode
+from rlp.exceptions import DecodingError
+
+from serializer.serializer import Serializer, sha3_hash
+from trie.nodes import TrieNode
+
+# Prefixes of byte strings and of lists with payloads shorter than 56 bytes
+SHORT_STRING_PREFIXES = [bytes((0x80 + n,)) for n in range(56)]
+SHORT_LIST_PREFIXES = [bytes((0xc0 + n,)) for n in range(56)]
+
+
+def _long_prefix(offset, length):
+    length_bytes = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes((offset + len(length_bytes),)) + length_bytes
+
+
+def encode_item(item):
+    """RLP encoding of a node, as byte strings and nested lists of them"""
+    if type(item) is bytes:
+        length = len(item)
+        if length == 1 and item[0] < 0x80:
+            return item
+        if length < 56:
+            return SHORT_STRING_PREFIXES[length] + item
+        return _long_prefix(0xb7, length) + item
+    if isinstance(item, (list, TrieNode)):
+        payload = b''.join([encode_item(x) for x in item])
+        length = len(payload)
+        if length < 56:
+            return SHORT_LIST_PREFIXES[length] + payload
+        return _long_prefix(0xf7, length) + payload
+    # Anything else, as the generic encoder does
+    return encode(item)
+
+
+def _decode_length(data, pos, offset):
+    """
+    :return: (start, end) of the payload of the long item at `pos`
+    """
+    length_size = data[pos] - offset
+    start = pos + 1 + length_size
+    if start > len(data):
+        raise DecodingError('Truncated length', data)
+    return start, start + int.from_bytes(data[pos + 1:start], 'big')
+
+
+def _decode_item(data, pos):
+    """
+    :return: (decoded item, position following it)
+    """
+    prefix = data[pos]
+    if prefix < 0x80:
+        return data[pos:pos + 1], pos + 1
+    if prefix < 0xb8:
+        start, end = pos + 1, pos + 1 + prefix - 0x80
+    elif prefix < 0xc0:
+        start, end = _decode_length(data, pos, 0xb7)
+    else:
+        if prefix < 0xf8:
+            start, end = pos + 1, pos + 1 + prefix - 0xc0
+        else:
+            start, end = _decode_length(data, pos, 0xf7)
+        if end > len(data):
+            raise DecodingError('Truncated list', data)
+        items = []
+        pos = start
+        while pos < end:
+            item, pos = _decode_item(data, pos)
+            items.append(item)
+        if pos != end:
+            raise DecodingError('List items overflow the list', data)
+        return items, end
+
+    if end > len(data):
+        raise DecodingError('Truncated string', data)
+    return data[start:end], end
+
+
+def decode_item(data):
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if not data:
+        raise DecodingError('Nothing to decode', data)
+    item, end = _decode_item(data, 0)
+    if end != len(data):
+        raise DecodingError('Trailing bytes after the item', data)
+    return item
+
+
+class FastRLPSerializer(Serializer):
+    """RLP serializer specialized for trie nodes, which are only made of byte
+    strings and lists. The encoding is the same as the one of
+    `RLPSerializer`, so both can be used on the same db.
+    """
+
+    @classmethod
+    def serialize_node(cls, node):
+        return encode_item(node)
+
+    @classmethod
+    def deserialize_to_node(cls, serz):
+        return decode_item(serz)
+
+    @classmethod
+    def hash_node(cls, node) -> Tuple[bytes, bytes]:
+        serz = cls.serialize_node(node)
+        return sha3_hash(serz), serz
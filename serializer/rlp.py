@@ -3,15 +3,18 @@ from typing import Tuple
 from rlp import encode, decode
 
 from serializer.serializer import Serializer, sha3_hash
+from trie.nodes import to_list
 
 
 class RLPSerializer(Serializer):
     @classmethod
     def serialize_node(cls, node):
-        return encode(node)
+        return encode(to_list(node))
 
     @classmethod
     def deserialize_to_node(cls, serz):
+        if isinstance(serz, memoryview):
+            serz = serz.tobytes()
         return decode(serz)
 
     @classmethod
@@ -25,6 +25,11 @@ REQUIRED = [
     'rlp==1.0.1', 'sha3==0.2.1'
 ]
 
+# Optional storage backends
+EXTRAS = {
+    'leveldb': ['plyvel'],
+}
+
 REQUIRED_FOR_TESTS = [
     'pytest==3.6.0'
 ]
@@ -100,8 +105,9 @@ setup(
     python_requires=REQUIRES_PYTHON,
     url=URL,
     packages=find_packages(
-        exclude=('tests',)),
+        exclude=('tests', 'benchmarks')),
     install_requires=REQUIRED,
+    extras_require=EXTRAS,
     tests_require=REQUIRED_FOR_TESTS,
     include_package_data=True,
     license='MIT',
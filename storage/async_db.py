@@ -0,0 +1,28 @@
+import asyncio
+
+
+class AsyncDB:
+    """Protocol of the dbs read by `trie.async_trie.AsyncTrie`, `get` is a
+    coroutine which raises KeyError if there is no value for the key.
+    """
+
+    async def get(self, key):
+        raise NotImplementedError
+
+
+class ExecutorDB(AsyncDB):
+    """Async db reading from a sync db, like `SqliteDB`, in an executor so
+    the event loop is not blocked
+    """
+
+    def __init__(self, db, executor=None):
+        """
+        :param executor: `concurrent.futures` executor, the default one of
+        the event loop if None
+        """
+        self.db = db
+        self.executor = executor
+
+    async def get(self, key):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, self.db.get, key)
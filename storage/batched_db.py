@@ -0,0 +1,68 @@
+class BatchedDB:
+    """Base of the persistent dbs. Puts and deletes are kept in a write batch
+    and applied at once on `commit`, until then they are visible to `get` of
+    this db only. Subclasses read from and write to the store.
+    """
+
+    def __init__(self):
+        self.kv = None
+        # Pending writes, value is None for a delete
+        self._batch = {}
+
+    def get(self, key):
+        try:
+            value = self._batch[key]
+        except KeyError:
+            return self._get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def put(self, key, value):
+        self._batch[key] = value
+
+    def delete(self, key):
+        self._batch[key] = None
+
+    def commit(self):
+        if not self._batch:
+            return
+        puts = [(k, v) for k, v in self._batch.items() if v is not None]
+        deletes = [k for k, v in self._batch.items() if v is None]
+        self._write(puts, deletes)
+        self._batch = {}
+
+    def rollback(self):
+        """drop the writes made since the last commit"""
+        self._batch = {}
+
+    def close(self):
+        pass
+
+    def _get(self, key):
+        """
+        :return: the value stored for `key`, KeyError if there is none
+        """
+        raise NotImplementedError
+
+    def _write(self, puts, deletes):
+        """atomically store the (key, value) pairs `puts` and delete the keys
+        `deletes`
+        """
+        raise NotImplementedError
+
+    def _has_key(self, key):
+        try:
+            self.get(key)
+        except KeyError:
+            return False
+        return True
+
+    def __contains__(self, key):
+        return self._has_key(key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
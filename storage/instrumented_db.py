@@ -0,0 +1,51 @@
+from eth_utils import big_endian_to_int
+
+from trie.utils import str_to_bytes
+
+
+class InstrumentedDB:
+    """Record the calls made to `db` in a `TrieStats`: the number of gets,
+    misses, puts and deletes, the bytes read and written and the duration of
+    the gets and commits.
+    """
+
+    def __init__(self, db, stats):
+        self.db = db
+        self.stats = stats
+        self.kv = None
+
+    def get(self, key):
+        with self.stats.timer('db_get'):
+            try:
+                value = self.db.get(key)
+            except KeyError:
+                self.stats.incr('db_misses')
+                raise
+        self.stats.incr('db_gets')
+        self.stats.incr('db_bytes_read', len(value))
+        return value
+
+    def put(self, key, value):
+        self.stats.incr('db_puts')
+        self.stats.incr('db_bytes_written', len(value))
+        self.db.put(key, value)
+
+    def delete(self, key):
+        self.stats.incr('db_deletes')
+        self.db.delete(key)
+
+    def commit(self):
+        with self.stats.timer('db_commit'):
+            self.db.commit()
+
+    def _has_key(self, key):
+        return key in self.db
+
+    def __contains__(self, key):
+        return self._has_key(key)
+
+    def __eq__(self, other):
+        return isinstance(other, self.__class__) and self.db == other.db
+
+    def __hash__(self):
+        return big_endian_to_int(str_to_bytes(self.__repr__()))
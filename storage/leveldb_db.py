@@ -0,0 +1,35 @@
+import plyvel
+
+from storage.batched_db import BatchedDB
+
+
+class LevelDB(BatchedDB):
+    """Persistent db in LevelDB, needs the `plyvel` package. The writes are
+    stored in a single write batch on `commit`.
+    """
+
+    def __init__(self, path, sync=False):
+        """
+        :param path: directory of the database, created if it does not exist
+        :param sync: wait for the write batches to be flushed to disk
+        """
+        super().__init__()
+        self.path = path
+        self.sync = sync
+        self._db = plyvel.DB(path, create_if_missing=True)
+
+    def _get(self, key):
+        value = self._db.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def _write(self, puts, deletes):
+        with self._db.write_batch(sync=self.sync) as batch:
+            for key, value in puts:
+                batch.put(key, value)
+            for key in deletes:
+                batch.delete(key)
+
+    def close(self):
+        self._db.close()
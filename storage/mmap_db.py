@@ -0,0 +1,190 @@
+import heapq
+import mmap
+import os
+import struct
+
+from storage.batched_db import BatchedDB
+
+# key, offset of the value in the log, length of the value
+INDEX_ENTRY = struct.Struct('>32sQI')
+KEY_SIZE = 32
+# Offset of the entries of deleted keys
+DELETED = 2 ** 64 - 1
+
+
+def _with_age(entries, age):
+    for key, offset, length in entries:
+        yield key, age, offset, length
+
+
+class MmapDB(BatchedDB):
+    """Append-only db for read mostly deployments. Values are appended to a
+    log file and found through an index of (key, offset, length) entries.
+    Both are memory mapped, `get` returns a `memoryview` of the value in the
+    log, so processes reading the same files share the page cache and
+    opening a db does not read it.
+    The index is a stack of segments sorted by key, newer ones taking
+    precedence. Each `commit` appends a segment with its entries and merges
+    it with the newest segments no more than twice as large, so an entry is
+    rewritten a logarithmic number of times and a lookup searches a
+    logarithmic number of segments. The list of segments is replaced at once.
+    Keys must be 32 bytes long, like node hashes. The space of overwritten
+    and deleted values in the log is not reclaimed.
+    """
+    LOG_FILE = 'nodes.log'
+    SEGMENTS_FILE = 'segments'
+    SEGMENT_FILE = 'nodes.{}.idx'
+
+    def __init__(self, path, sync=False):
+        """
+        :param path: directory of the database, created if it does not exist
+        :param sync: flush the files to disk on commit
+        """
+        super().__init__()
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.sync = sync
+        self._log_path = os.path.join(path, self.LOG_FILE)
+        self._segments_path = os.path.join(path, self.SEGMENTS_FILE)
+        open(self._log_path, 'ab').close()
+        open(self._segments_path, 'a').close()
+        self.refresh()
+
+    def refresh(self):
+        """map the files again, to read what another process committed"""
+        while True:
+            names = self._read_segment_names()
+            # The log is mapped first so that it covers the entries of the
+            # index
+            log = self._map(self._log_path)
+            try:
+                segments = [self._map(os.path.join(self.path, name))
+                            for name in names]
+            except FileNotFoundError:
+                if self._read_segment_names() == names:
+                    raise
+                # Merged by a commit meanwhile, read the new list
+                continue
+            break
+        self._log = log
+        # Newest first, in a single assignment as another thread may read
+        self._segments = list(zip(names, segments))[::-1]
+
+    def put(self, key, value):
+        if len(key) != KEY_SIZE:
+            raise ValueError('Keys must be {} bytes long'.format(KEY_SIZE))
+        super().put(key, value)
+
+    def _get(self, key):
+        log = self._log
+        for _, index in self._segments:
+            entry = self._search(index, key)
+            if entry is not None:
+                _, offset, length = entry
+                if offset == DELETED:
+                    break
+                return log[offset:offset + length]
+        raise KeyError(key)
+
+    @staticmethod
+    def _search(index, key):
+        """binary search of the entry of `key` in a segment"""
+        size = INDEX_ENTRY.size
+        lo, hi = 0, len(index) // size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mid * size
+            mid_key = index[start:start + KEY_SIZE].tobytes()
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return INDEX_ENTRY.unpack(index[start:start + size])
+        return None
+
+    def _write(self, puts, deletes):
+        entries = []
+        with open(self._log_path, 'ab') as f:
+            offset = f.seek(0, os.SEEK_END)
+            for key, value in puts:
+                f.write(value)
+                entries.append((key, offset, len(value)))
+                offset += len(value)
+            self._flush(f)
+        entries.extend((key, DELETED, 0) for key in deletes)
+        entries.sort()
+
+        # Merge the newest segments while they are not much larger than the
+        # new one
+        segments = self._segments
+        merged = 0
+        count = len(entries)
+        while merged < len(segments):
+            segment_count = len(segments[merged][1]) // INDEX_ENTRY.size
+            if segment_count > 2 * count:
+                break
+            count += segment_count
+            merged += 1
+        sources = [entries] + [INDEX_ENTRY.iter_unpack(index)
+                               for _, index in segments[:merged]]
+        # Deleted keys are dropped once no older segment can hold them
+        keep_deleted = merged < len(segments)
+
+        names = [name for name, _ in segments[merged:]][::-1]
+        name = self.SEGMENT_FILE.format(self._next_segment_number())
+        with open(os.path.join(self.path, name), 'wb') as f:
+            f.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in
+                             self._merge(sources, keep_deleted)))
+            self._flush(f)
+
+        # The new list replaces the old one at once, readers see either
+        tmp_path = self._segments_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(''.join(n + '\n' for n in names + [name]))
+            self._flush(f)
+        os.replace(tmp_path, self._segments_path)
+        self.refresh()
+        for old_name, _ in segments[:merged]:
+            os.remove(os.path.join(self.path, old_name))
+
+    @staticmethod
+    def _merge(sources, keep_deleted):
+        """
+        :param sources: iterables of entries sorted by key, newest first
+        :return: the entries of the newest source holding each key
+        """
+        last_key = None
+        for key, _, offset, length in heapq.merge(
+                *(_with_age(source, age) for age, source in enumerate(sources))):
+            if key == last_key:
+                continue
+            last_key = key
+            if offset != DELETED or keep_deleted:
+                yield key, offset, length
+
+    def _next_segment_number(self):
+        # Above the numbers of all the current segments, merged ones included
+        numbers = [int(name.split('.')[1]) for name, _ in self._segments]
+        return max(numbers, default=0) + 1
+
+    def _read_segment_names(self):
+        with open(self._segments_path) as f:
+            return f.read().split()
+
+    def close(self):
+        # The maps are closed once the values returned by `get` are released
+        self._log = memoryview(b'')
+        self._segments = []
+
+    def _flush(self, f):
+        f.flush()
+        if self.sync:
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _map(path):
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return memoryview(b'')
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
@@ -51,7 +51,7 @@ class RefcountDB:
             self.db.put(key, sub1(existing[:4]) + existing[4:])
 
     def commit(self):
-        pass
+        self.db.commit()
 
     def _has_key(self, key):
         return key in self.db
@@ -0,0 +1,67 @@
+import sqlite3
+from threading import Lock, local
+
+from storage.batched_db import BatchedDB
+
+
+class SqliteDB(BatchedDB):
+    """Persistent db in a SQLite file, the writes are stored in a single
+    transaction on `commit`. The db can be used from several threads, each
+    reading through its own connection so that reads run concurrently with
+    each other and with the transaction of a commit.
+    """
+
+    def __init__(self, path, table='kv'):
+        """
+        :param path: path of the database file, created if it does not exist
+        :param table: name of the table of keys and values
+        """
+        super().__init__()
+        self.path = path
+        self.table = table
+        # Connection of the commits, which can be made from any thread
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._write_lock = Lock()
+        # Readers do not block the writer and the other way round
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS {} '
+                           '(key BLOB PRIMARY KEY, value BLOB NOT NULL) '
+                           'WITHOUT ROWID'.format(table))
+        self._conn.commit()
+        self._local = local()
+        self._readers = []
+        self._readers_lock = Lock()
+        self._select = 'SELECT value FROM {} WHERE key = ?'.format(table)
+        self._insert = 'INSERT OR REPLACE INTO {} VALUES (?, ?)'.format(table)
+        self._delete = 'DELETE FROM {} WHERE key = ?'.format(table)
+
+    def _get(self, key):
+        row = self._reader().execute(self._select, (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def _write(self, puts, deletes):
+        with self._write_lock, self._conn:
+            self._conn.executemany(self._insert, puts)
+            self._conn.executemany(self._delete, ((k,) for k in deletes))
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+        self._conn.close()
+
+    def _reader(self):
+        """
+        :return: the connection of the current thread, opened on first use
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # `close` may be called from another thread
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
@@ -0,0 +1,112 @@
+from eth_utils import big_endian_to_int
+
+from trie.utils import str_to_bytes
+
+
+class WriteBufferDB:
+    """Buffer the puts and deletes made to `db` in memory until `commit`, so
+    nodes replaced before the commit are never written. On commit the
+    buffered writes are applied and `db` is committed. Reads are served by
+    the buffer first.
+    By default the last write of a key wins, as with a plain db: a delete
+    hides the key and is applied on commit, unless it follows a buffered put
+    of a key which is not in `db`, in which case both are dropped.
+    With `refcounting`, for a reference counting db like `RefcountDB`, the
+    writes of a key are counted instead: a put and a delete cancel each other
+    out and the remaining ones are applied as many times as they were made.
+    A key with more deletes than puts is read from `db` until the commit, as
+    reference counting dbs keep it.
+    """
+
+    def __init__(self, db, refcounting=False):
+        """
+        :param refcounting: count the puts and deletes of a key, for dbs
+        counting the references to their keys
+        """
+        self.db = db
+        self.kv = None
+        self.refcounting = refcounting
+        # key -> value, None for a delete, or, when reference counting,
+        # key -> [puts minus deletes, last value put]
+        self._buffer = {}
+
+    def get(self, key):
+        if key not in self._buffer:
+            return self.db.get(key)
+        pending = self._buffer[key]
+        if not self.refcounting:
+            if pending is None:
+                raise KeyError(key)
+            return pending
+        if pending[0] > 0:
+            return pending[1]
+        return self.db.get(key)
+
+    def put(self, key, value):
+        if not self.refcounting:
+            self._buffer[key] = value
+            return
+        pending = self._buffer.get(key)
+        if pending is None:
+            self._buffer[key] = [1, value]
+            return
+        pending[0] += 1
+        pending[1] = value
+        if not pending[0]:
+            del self._buffer[key]
+
+    def delete(self, key):
+        if not self.refcounting:
+            if self._buffer.get(key) is not None and key not in self.db:
+                # Put since the last commit only
+                del self._buffer[key]
+            else:
+                self._buffer[key] = None
+            return
+        pending = self._buffer.get(key)
+        if pending is None:
+            self._buffer[key] = [-1, None]
+            return
+        pending[0] -= 1
+        if not pending[0]:
+            del self._buffer[key]
+
+    def commit(self):
+        for key, pending in self._buffer.items():
+            if not self.refcounting:
+                if pending is None:
+                    self.db.delete(key)
+                else:
+                    self.db.put(key, pending)
+                continue
+            count, value = pending
+            for _ in range(count):
+                self.db.put(key, value)
+            for _ in range(-count):
+                self.db.delete(key)
+        self._buffer = {}
+        self.db.commit()
+
+    def rollback(self):
+        """drop the writes made since the last commit"""
+        self._buffer = {}
+
+    def __len__(self):
+        """number of keys with pending writes"""
+        return len(self._buffer)
+
+    def _has_key(self, key):
+        try:
+            self.get(key)
+        except KeyError:
+            return False
+        return True
+
+    def __contains__(self, key):
+        return self._has_key(key)
+
+    def __eq__(self, other):
+        return isinstance(other, self.__class__) and self.db == other.db
+
+    def __hash__(self):
+        return big_endian_to_int(str_to_bytes(self.__repr__()))
@@ -6,7 +6,7 @@ from trie.trie import Trie
 
 @pytest.fixture(scope='function')
 def tempdir(tmpdir_factory):
-    return tmpdir_factory.mktemp('').strpath
+    return tmpdir_factory.mktemp('db').strpath
 
 
 @pytest.fixture(scope='function')
@@ -0,0 +1,110 @@
+import asyncio
+from random import randint, sample
+
+import pytest
+
+from storage.async_db import AsyncDB, ExecutorDB
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.async_trie import AsyncTrie
+from trie.cache import NodeCache
+from trie.exceptions import KeyNotFoundError
+from trie.trie import Trie
+
+
+class SlowDB(AsyncDB):
+    """async db counting the reads in flight"""
+
+    def __init__(self, db):
+        self.db = db
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get(self, key):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        return self.db.get(key)
+
+
+def build_trie():
+    key_vals = {random_string(randint(1, 20)).encode():
+                random_string(randint(1, 60)).encode() for _ in range(1000)}
+    key_vals.update({b'abcd1': b'x1', b'abcd11': b'x2', b'abcd2': b'x3'})
+    trie = Trie(EphemDB())
+    trie.update_many(key_vals)
+    return trie, key_vals
+
+
+def test_async_lookups():
+    trie, key_vals = build_trie()
+    keys = sample(list(key_vals), 100)
+
+    async def run():
+        atrie = AsyncTrie.from_trie(trie)
+        values = await asyncio.gather(*(atrie.aget(k) for k in keys))
+        assert values == [key_vals[k] for k in keys]
+
+        for key in keys[:10]:
+            value, proof = await atrie.aget(key, with_proof=True)
+            assert (value, proof) == trie.get(key, with_proof=True)
+
+        with pytest.raises(KeyNotFoundError) as err:
+            await atrie.aget(b'abcd', with_proof=True)
+        assert Trie.verify_proof_of_absence(
+            trie.root_hash, b'abcd',
+            err.value.proof_nodes + [await atrie.get_root_node()])
+
+        assert await atrie.aget_multi(keys + [b'missing']) == \
+            {k: key_vals[k] for k in keys}
+        assert await atrie.aget_multi(keys, with_proof=True) == \
+            trie.get_multi(keys, with_proof=True)
+
+        for prefix in (b'', b'a', b'abcd', b'abcd1', b'abcd3', b'zzzz'):
+            items, proof = await atrie.aget_keys_with_prefix(prefix,
+                                                             with_proof=True)
+            expected, expected_proof = trie.get_keys_with_prefix(
+                prefix, with_proof=True)
+            assert items == expected
+            assert sorted(map(trie.node_serializer.serialize_node, proof)) \
+                == sorted(map(trie.node_serializer.serialize_node,
+                              expected_proof))
+
+        blank = AsyncTrie(ExecutorDB(EphemDB()))
+        assert await blank.aget_keys_with_prefix(b'') == {}
+        with pytest.raises(KeyNotFoundError):
+            await blank.aget(b'k')
+
+    asyncio.run(run())
+
+
+def test_missing_key_at_blank_branch_slot():
+    trie = Trie(EphemDB())
+    trie.update_many({b'a' * 40: b'v1', b'b' * 40: b'v2'})
+    key = b'c' * 40
+    with pytest.raises(KeyNotFoundError) as expected:
+        trie.get(key, with_proof=True)
+
+    async def run():
+        atrie = AsyncTrie.from_trie(trie)
+        with pytest.raises(KeyNotFoundError) as err:
+            await atrie.aget(key, with_proof=True)
+        assert err.value.proof_nodes == expected.value.proof_nodes
+        assert Trie.verify_proof_of_absence(
+            trie.root_hash, key,
+            err.value.proof_nodes + [await atrie.get_root_node()])
+
+    asyncio.run(run())
+
+
+def test_children_fetched_concurrently():
+    trie, key_vals = build_trie()
+    db = SlowDB(trie.db)
+
+    async def run():
+        atrie = AsyncTrie(db, trie.root_hash, node_cache=NodeCache())
+        assert await atrie.aget_keys_with_prefix(b'') == key_vals
+        assert db.max_in_flight > 1
+
+    asyncio.run(run())
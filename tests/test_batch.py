@@ -0,0 +1,115 @@
+from random import randint
+
+import pytest
+
+from serializer.rlp import RLPSerializer
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.trie import Trie
+
+
+class CountingDB(EphemDB):
+    def __init__(self):
+        super().__init__()
+        self.puts = 0
+
+    def put(self, key, value):
+        self.puts += 1
+        super().put(key, value)
+
+
+def random_key_vals(count):
+    return {random_string(randint(8, 40)).encode():
+            random_string(randint(10, 100)).encode() for _ in range(count)}
+
+
+def test_batch_same_root_as_single_updates(ephem_trie):
+    key_vals = random_key_vals(1000)
+    for k, v in key_vals.items():
+        ephem_trie.update(k, v)
+
+    batched_trie = Trie(EphemDB())
+    with batched_trie.batch():
+        for k, v in key_vals.items():
+            batched_trie.update(k, v)
+
+    assert batched_trie.root_hash == ephem_trie.root_hash
+    for k, v in key_vals.items():
+        assert batched_trie.get(k) == v
+        _, proof = batched_trie.get(k, with_proof=True)
+        proof.append(batched_trie.root_node)
+        assert Trie.verify_proof_of_existence(batched_trie.root_hash, k, v,
+                                              proof)
+
+    # All nodes reachable from the root are in the db
+    reloaded = Trie(batched_trie.db, batched_trie.root_hash)
+    assert reloaded.to_dict() == key_vals
+
+
+def test_batch_writes_less():
+    key_vals = random_key_vals(500)
+
+    db = CountingDB()
+    trie = Trie(db)
+    for k, v in key_vals.items():
+        trie.update(k, v)
+
+    batched_db = CountingDB()
+    batched_trie = Trie(batched_db)
+    batched_trie.update_many(key_vals)
+
+    assert batched_trie.root_hash == trie.root_hash
+    assert batched_db.puts * 2 < db.puts
+    # Only nodes reachable from the root are written
+    assert batched_db.puts == len(batched_db.db)
+
+
+def test_batch_rollback_on_error(ephem_trie):
+    trie = ephem_trie
+    trie.update(b'k1', b'v1')
+    root_hash = trie.root_hash
+
+    with pytest.raises(ValueError):
+        with trie.batch():
+            trie.update(b'k1', b'v2')
+            trie.update(b'k2', b'v2')
+            raise ValueError
+
+    assert trie.root_hash == root_hash
+    assert trie.get(b'k1') == b'v1'
+    with pytest.raises(KeyError):
+        trie.get(b'k2')
+
+
+def test_update_with_same_value_is_noop():
+    db = CountingDB()
+    trie = Trie(db)
+    trie.update_many(random_key_vals(100))
+    trie.update(b'k1', b'v1')
+    puts, root_hash = db.puts, trie.root_hash
+
+    trie.update(b'k1', b'v1')
+    assert db.puts == puts
+    assert trie.root_hash == root_hash
+
+
+def test_unchanged_nodes_not_encoded_again():
+    class CountingSerializer(RLPSerializer):
+        serialized = 0
+
+        @classmethod
+        def serialize_node(cls, node):
+            cls.serialized += 1
+            return super().serialize_node(node)
+
+    trie = Trie(EphemDB(), node_serializer=CountingSerializer)
+    key_vals = random_key_vals(1000)
+    trie.update_many(key_vals)
+    depth = max(len(trie.get(k, with_proof=True)[1]) for k in key_vals) + 1
+
+    CountingSerializer.serialized = 0
+    with trie.batch():
+        for k in list(key_vals)[:2]:
+            trie.update(k, b'new value')
+    # Only the nodes on the paths of the updated keys are encoded
+    assert CountingSerializer.serialized <= 2 * depth
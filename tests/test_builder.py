@@ -0,0 +1,69 @@
+from random import randint
+
+import pytest
+
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.cache import NodeCache
+from trie.stats import TrieStats
+from trie.trie import Trie
+
+
+def check_same_as_updates(key_vals):
+    trie = Trie(EphemDB())
+    for k, v in key_vals.items():
+        trie.update(k, v)
+
+    built = Trie.from_sorted_items(EphemDB(), sorted(key_vals.items()))
+    assert built.root_hash == trie.root_hash
+    # Only the nodes of the final trie are stored
+    assert set(built.db.db.items()) <= set(trie.db.db.items())
+    return built
+
+
+def test_build_small():
+    check_same_as_updates({})
+    check_same_as_updates({b'k1': b'v1'})
+    # Keys which are prefixes of other keys
+    check_same_as_updates(dict([
+        (b'91', b'v1'),
+        (b'92', b'v2'),
+        (b'93', b'v3'),
+        (b'94', b'v4'),
+        (b'95', b'v5'),
+        (b'911', b'v11'),
+        (b'922', b'v22'),
+        (b'9123', b'v123'),
+        (b'abacew1212nnnnnkasassw', b'dsdu2b s212121212 dssd dsd')
+    ]))
+
+
+def test_build_large():
+    key_vals = {}
+    for _ in range(3000):
+        key_vals[random_string(randint(1, 20)).encode()] = \
+            random_string(randint(1, 100)).encode()
+    for _ in range(300):
+        key_vals['abcdefgh{}'.format(randint(25, 25000)).encode()] = \
+            random_string(randint(1, 10)).encode()
+
+    built = check_same_as_updates(key_vals)
+    for k, v in key_vals.items():
+        assert built.get(k) == v
+
+
+def test_build_unsorted():
+    with pytest.raises(ValueError):
+        Trie.from_sorted_items(EphemDB(), [(b'b', b'1'), (b'a', b'2')])
+    with pytest.raises(ValueError):
+        Trie.from_sorted_items(EphemDB(), [(b'a', b'1'), (b'a', b'2')])
+
+
+def test_build_options():
+    cache = NodeCache(100)
+    stats = TrieStats()
+    built = Trie.from_sorted_items(EphemDB(), [(b'a', b'1'), (b'b', b'2')],
+                                   prune=True, node_cache=cache, stats=stats)
+    assert built.prune
+    assert built.node_cache is cache
+    assert built.stats is stats
@@ -0,0 +1,80 @@
+import os
+from threading import Thread
+
+from storage.ephem_db import EphemDB
+from storage.sqlite_db import SqliteDB
+from trie.cache import NodeCache
+from trie.trie import Trie
+
+KEYS = [b'key%d' % i for i in range(50)]
+K1 = b'1' * 32
+
+
+def test_readers_see_committed_roots():
+    trie = Trie(EphemDB(), node_cache=NodeCache(200))
+    trie.update_many({key: b'0' for key in KEYS})
+    blocks = 100
+    errors = []
+    done = []
+
+    def read():
+        try:
+            while not done:
+                snapshot = trie.snapshot()
+                # All the keys were updated by the same block
+                values = set(snapshot.get_multi(KEYS).values())
+                assert len(values) == 1
+                value = values.pop()
+                _, proof = snapshot.get(KEYS[0], with_proof=True)
+                assert Trie.verify_proof_of_existence(
+                    snapshot.root_hash, KEYS[0], value,
+                    proof + [snapshot.root_node])
+        except Exception as e:
+            errors.append(e)
+
+    def write():
+        for block in range(1, blocks + 1):
+            with trie.batch():
+                for key in KEYS:
+                    trie.update(key, str(block).encode())
+
+    readers = [Thread(target=read) for _ in range(4)]
+    writers = [Thread(target=write) for _ in range(2)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    done.append(True)
+    for t in readers:
+        t.join()
+
+    assert errors == []
+    assert trie.snapshot().root_hash == trie.root_hash
+    assert trie.snapshot().get(KEYS[0]) == str(blocks).encode()
+
+
+def test_sqlite_reads_during_commit(tempdir):
+    db = SqliteDB(os.path.join(tempdir, 'trie.db'))
+    db.put(K1, b'v1')
+    db.commit()
+    connections = set()
+    results = []
+
+    def read():
+        results.append(db.get(K1))
+        connections.add(id(db._reader()))
+
+    # A commit holding its write transaction open does not block readers,
+    # which see the last committed values
+    with db._write_lock, db._conn:
+        db._conn.execute(db._insert, (K1, b'v2'))
+        threads = [Thread(target=read) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        assert not any(t.is_alive() for t in threads)
+    assert results == [b'v1'] * 4
+    assert len(connections) == 4
+    assert db.get(K1) == b'v2'
+    db.close()
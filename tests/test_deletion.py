@@ -0,0 +1,121 @@
+from random import randint, sample
+
+import pytest
+
+from storage.ephem_db import EphemDB
+from storage.refcount_db import RefcountDB
+from tests.helper import random_string
+from trie.trie import Trie
+
+
+def random_key_vals(count):
+    return {random_string(randint(1, 40)).encode():
+            random_string(randint(1, 100)).encode() for _ in range(count)}
+
+
+def built_root_hash(key_vals):
+    return Trie.from_sorted_items(EphemDB(), sorted(key_vals.items())).root_hash
+
+
+def test_delete_small(ephem_trie):
+    trie = ephem_trie
+    key_vals = dict([
+        (b'91', b'v1'),
+        (b'92', b'v2'),
+        (b'911', b'v11'),
+        (b'9123', b'v123'),
+        (b'abacew1212nnnnnkasassw', b'dsdu2b s212121212 dssd dsd')
+    ])
+    trie.update_many(key_vals)
+
+    for key in list(key_vals):
+        trie.delete(key)
+        del key_vals[key]
+        assert trie.root_hash == built_root_hash(key_vals)
+        with pytest.raises(KeyError):
+            trie.get(key)
+        for k, v in key_vals.items():
+            assert trie.get(k) == v
+
+    assert trie.root_hash == trie.BLANK_ROOT
+    assert trie.root_node == b''
+
+
+def test_delete_missing_key(ephem_trie):
+    trie = ephem_trie
+    trie.update_many({b'abcd1': b'v1', b'abcd2': b'v2', b'xyz': b'v3'})
+    root_hash = trie.root_hash
+    for key in (b'abcd', b'abcd3', b'abcd11', b'x', b'q'):
+        trie.delete(key)
+        assert trie.root_hash == root_hash
+
+
+def test_delete_large(ephem_trie):
+    trie = ephem_trie
+    key_vals = random_key_vals(2000)
+    trie.update_many(key_vals)
+
+    deleted = sample(list(key_vals), 1000)
+    with trie.batch():
+        for key in deleted:
+            trie.delete(key)
+            del key_vals[key]
+
+    assert trie.root_hash == built_root_hash(key_vals)
+    assert trie.to_dict() == key_vals
+
+
+def test_pruning_removes_unreferenced_nodes():
+    db = RefcountDB(EphemDB())
+    trie = Trie(db, prune=True)
+    key_vals = random_key_vals(1000)
+    for k, v in key_vals.items():
+        trie.update(k, v)
+    trie.commit()
+
+    # Update some values and delete some keys over several commits
+    keys = list(key_vals)
+    for _ in range(5):
+        with trie.batch():
+            for key in sample(keys, 50):
+                trie.update(key, random_string(randint(1, 100)).encode())
+                key_vals[key] = trie.get(key)
+            for key in sample(keys, 50):
+                trie.delete(key)
+                keys.remove(key)
+                del key_vals[key]
+
+    # The db holds exactly the nodes of the current trie
+    built = Trie.from_sorted_items(EphemDB(), sorted(key_vals.items()))
+    assert built.root_hash == trie.root_hash
+    assert set(db.db.db) == set(built.db.db)
+    assert Trie(db, trie.root_hash).to_dict() == key_vals
+
+    for key in keys:
+        trie.delete(key)
+    trie.commit()
+    assert db.db.db == {}
+
+
+def test_clear_with_pruning():
+    db = RefcountDB(EphemDB())
+    trie = Trie(db, prune=True)
+    trie.update_many(random_key_vals(500))
+    trie.clear()
+    trie.commit()
+    assert db.db.db == {}
+    assert trie.root_hash == trie.BLANK_ROOT
+
+
+def test_no_deletes_recorded_without_pruning():
+    db = EphemDB()
+    trie = Trie(db)
+    key_vals = random_key_vals(500)
+    trie.update_many(key_vals)
+    stored = dict(db.db)
+    for key in sample(list(key_vals), 100):
+        trie.update(key, b'new')
+        trie.delete(key)
+    assert trie.deletes == []
+    trie.commit()
+    assert stored.items() <= db.db.items()
@@ -0,0 +1,58 @@
+from random import randint, sample
+
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.stats import TrieStats
+from trie.trie import Trie
+
+
+def expected_diff(old, new):
+    return sorted((k, old.get(k), new.get(k)) for k in set(old) | set(new)
+                  if old.get(k) != new.get(k))
+
+
+def test_diff():
+    trie = Trie(EphemDB())
+    blank_root = trie.root_hash
+    old = {random_string(randint(1, 30)).encode():
+           random_string(randint(1, 100)).encode() for _ in range(2000)}
+    old.update({b'91': b'v1', b'911': b'v11', b'9123': b'v123'})
+    trie.update_many(old)
+    old_root = trie.root_hash
+
+    new = dict(old)
+    with trie.batch():
+        for key in sample(sorted(old.keys() - {b'911'}), 30) + [b'911']:
+            trie.delete(key)
+            del new[key]
+        for key in sample(list(new), 30):
+            new[key] = b'changed' + new[key]
+            trie.update(key, new[key])
+        for key in [random_string(randint(1, 30)).encode()
+                    for _ in range(30)] + [b'9', b'91234']:
+            new[key] = b'added'
+            trie.update(key, b'added')
+    new_root = trie.root_hash
+
+    assert list(trie.diff(old_root, new_root)) == expected_diff(old, new)
+    assert list(trie.diff(new_root, old_root)) == expected_diff(new, old)
+    assert list(trie.diff(old_root, old_root)) == []
+    assert list(trie.diff(blank_root, new_root)) == expected_diff({}, new)
+    assert list(trie.diff(old_root, blank_root)) == expected_diff(old, {})
+
+
+def test_diff_skips_shared_subtrees():
+    stats = TrieStats()
+    trie = Trie(EphemDB(), stats=stats)
+    trie.update_many({random_string(randint(1, 30)).encode(): b'v'
+                      for _ in range(5000)})
+    old_root = trie.root_hash
+    trie.update(b'changed', b'v2')
+
+    with stats.scope() as full:
+        list(trie.items(trie.at(old_root).root_node))
+    with stats.scope() as diff:
+        assert list(trie.diff(old_root, trie.root_hash)) == \
+            [(b'changed', None, b'v2')]
+    assert diff.counters['nodes_read'] < 20
+    assert full.counters['nodes_read'] > 1000
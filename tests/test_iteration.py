@@ -0,0 +1,37 @@
+from random import randint
+
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.trie import Trie
+
+
+def test_items_in_key_order(ephem_trie):
+    trie = ephem_trie
+    assert list(trie.items()) == []
+
+    key_vals = {random_string(randint(1, 30)).encode():
+                random_string(randint(1, 100)).encode() for _ in range(2000)}
+    # Keys which are prefixes of other keys
+    key_vals.update({b'91': b'v1', b'911': b'v11', b'9123': b'v123'})
+    trie.update_many(key_vals)
+
+    expected = sorted(key_vals.items())
+    assert list(trie.items()) == expected
+    assert list(trie.keys()) == [k for k, _ in expected]
+    assert list(trie.values()) == [v for _, v in expected]
+    assert trie.to_dict() == key_vals
+
+    # Iterating over an older root
+    old_root = trie.root_node
+    trie.update(b'91', b'changed')
+    assert list(trie.items(old_root)) == expected
+    assert dict(trie.items())[b'91'] == b'changed'
+
+
+def test_items_is_lazy():
+    trie = Trie(EphemDB())
+    trie.update_many({str(i).encode(): b'v' for i in range(1000)})
+    items = trie.items()
+    assert next(items) == (b'0', b'v')
+    assert next(items) == (b'1', b'v')
+    assert next(items) == (b'10', b'v')
@@ -216,3 +216,43 @@ def test_proof_multiple_prefix_nodes(ephem_trie):
         assert not Trie.verify_proof_of_existence_multi_keys(trie.root_hash,
                                                              encoded, proof)
 
+
+def test_iter_prefix_pages(ephem_trie):
+    trie = ephem_trie
+    key_vals = {random_string(randint(1, 20)).encode(): random_string(10).encode()
+                for _ in range(500)}
+    prefixed = {'acc{}'.format(randint(0, 100000)).encode(): str(i).encode()
+                for i in range(300)}
+    # Keys which are prefixes of other keys
+    prefixed.update({b'acc': b'v', b'acc1': b'v1', b'acc12': b'v12'})
+    key_vals.update(prefixed)
+    trie.update_many(key_vals)
+
+    expected = sorted(prefixed.items())
+    assert list(trie.iter_prefix(b'acc')) == expected
+    assert list(trie.iter_prefix(b'acc', limit=7)) == expected[:7]
+    assert list(trie.iter_prefix(b'acc_none')) == []
+
+    # Resume from the last key of each page
+    pages = []
+    cursor = None
+    while True:
+        page, proof = trie.iter_prefix(b'acc', start_after=cursor, limit=40,
+                                       with_proof=True)
+        if not page:
+            break
+        proof.append(trie.root_node)
+        assert Trie.verify_proof_of_existence_multi_keys(trie.root_hash,
+                                                         dict(page), proof)
+        pages.append(page)
+        cursor = page[-1][0]
+    assert [kv for page in pages for kv in page] == expected
+    assert all(len(page) == 40 for page in pages[:-1])
+
+    # The cursor does not need to be a key of the trie
+    assert list(trie.iter_prefix(b'acc', start_after=b'acc1')) == \
+        [kv for kv in expected if kv[0] > b'acc1']
+    assert list(trie.iter_prefix(b'acc', start_after=b'acc0zz')) == \
+        [kv for kv in expected if kv[0] > b'acc0zz']
+    assert list(trie.iter_prefix(b'acc', start_after=b'ab')) == expected
+    assert list(trie.iter_prefix(b'acc', start_after=b'b')) == []
@@ -0,0 +1,45 @@
+from random import randint, sample
+
+import pytest
+
+from tests.helper import random_string
+from trie.exceptions import KeyNotFoundError
+from trie.trie import Trie
+
+
+def test_get_multi(ephem_trie):
+    trie = ephem_trie
+    key_vals = {random_string(randint(1, 30)).encode():
+                random_string(randint(1, 100)).encode() for _ in range(3000)}
+    key_vals.update({b'91': b'v1', b'911': b'v11', b'9123': b'v123'})
+    trie.update_many(key_vals)
+
+    present = sample(list(key_vals), 300) + [b'91', b'911', b'9123']
+    missing = [b'9', b'912', b'91234'] + \
+        [random_string(randint(1, 30)).encode() for _ in range(100)]
+    missing = [k for k in missing if k not in key_vals]
+
+    assert trie.get_multi(present + missing) == \
+        {k: key_vals[k] for k in present}
+
+    values, proof = trie.get_multi(present + missing, with_proof=True)
+    assert values == {k: key_vals[k] for k in present}
+
+    # Same nodes as the proofs of the keys one by one, without duplicates
+    single_proofs = {}
+    for key in present:
+        _, nodes = trie.get(key, with_proof=True)
+        single_proofs.update((trie.node_serializer.hash_node(n)[0], n)
+                             for n in nodes)
+    for key in missing:
+        with pytest.raises(KeyNotFoundError) as err:
+            trie.get(key, with_proof=True)
+        single_proofs.update((trie.node_serializer.hash_node(n)[0], n)
+                             for n in err.value.proof_nodes)
+    assert proof == single_proofs
+
+    proof_nodes = list(proof.values()) + [trie.root_node]
+    assert Trie.verify_proof_of_existence_multi_keys(trie.root_hash, values,
+                                                     proof_nodes)
+    for key in missing:
+        assert Trie.verify_proof_of_absence(trie.root_hash, key, proof_nodes)
@@ -0,0 +1,68 @@
+from random import randint, getrandbits
+
+from trie.nibble_path import NibblePath
+from trie.utils import bin_to_nibbles, pack_nibbles, unpack_to_nibbles, \
+    nibbles_to_bin
+
+
+def random_nibbles(length):
+    return [randint(0, 15) for _ in range(length)]
+
+
+def test_nibble_path_from_bytes():
+    path = NibblePath(b'he')
+    assert path == [6, 8, 6, 5] == bin_to_nibbles('he')
+    assert len(path) == 4
+    assert path[0] == 6 and path[-1] == 5
+    assert path[1:] == [8, 6, 5]
+    assert path[1:3] == [8, 6]
+    assert path[:-1] == [6, 8, 6]
+    assert path[4:] == []
+    assert not path[4:]
+    assert path.to_bytes() == b'he'
+    assert path[2:].to_bytes() == b'e'
+    assert path[1:3].to_bytes() == bytes([0x86])
+
+
+def test_nibble_path_packing():
+    for _ in range(200):
+        nibbles = random_nibbles(randint(0, 20))
+        for start in range(min(3, len(nibbles) + 1)):
+            path = NibblePath.from_nibbles(nibbles)[start:]
+            for terminator in (True, False):
+                expected = nibbles[start:] + ([16] if terminator else [])
+                packed = path.to_packed(terminator)
+                assert packed == pack_nibbles(expected)
+                assert unpack_to_nibbles(packed) == expected
+                unpacked, has_terminator = NibblePath.from_packed(packed)
+                assert unpacked == nibbles[start:]
+                assert has_terminator == terminator
+
+
+def test_nibble_path_compare():
+    for _ in range(500):
+        a = random_nibbles(randint(0, 12))
+        b = a[:randint(0, len(a))] + random_nibbles(randint(0, 4))
+        for a_start in range(2):
+            for b_start in range(2):
+                x = NibblePath.from_nibbles([0] * a_start + a)[a_start:]
+                y = NibblePath.from_nibbles([0] * b_start + b)[b_start:]
+                common = 0
+                while common < min(len(a), len(b)) and a[common] == b[common]:
+                    common += 1
+                assert x.common_prefix_length(y) == common
+                assert x.startswith(y) == (a[:len(b)] == b)
+                assert (x == y) == (a == b)
+                assert (x < y) == (a < b)
+                assert (x <= y) == (a <= b)
+                assert (x + y) == a + b
+                assert (x + y).to_packed() == pack_nibbles(a + b)
+                assert (x + tuple(b)) == ([1] + x)[1:] + y == a + b
+                assert ([1] + x) == [1] + a
+                assert list(x) == a
+
+
+def test_nibbles_to_bin():
+    key = bytes(getrandbits(8) for _ in range(20))
+    assert nibbles_to_bin(bin_to_nibbles(key)) == key
+    assert NibblePath(key).tolist() == bin_to_nibbles(key)
@@ -0,0 +1,61 @@
+from random import randint
+
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.cache import NodeCache
+from trie.trie import Trie
+
+
+class CountingDB(EphemDB):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return super().get(key)
+
+
+def test_node_cache_eviction():
+    cache = NodeCache(capacity=2)
+    cache.put(b'a', [b'1'])
+    cache.put(b'b', [b'2'])
+    assert cache.get(b'a') == [b'1']
+    cache.put(b'c', [b'3'])
+    # b'b' was the least recently used
+    assert b'b' not in cache
+    assert cache.get(b'b') is None
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+
+def test_trie_reads_through_cache():
+    key_vals = {random_string(randint(8, 40)).encode():
+                random_string(randint(10, 100)).encode() for _ in range(1000)}
+    db = CountingDB()
+    trie = Trie(db)
+    trie.update_many(key_vals)
+    root_hash = trie.root_hash
+
+    cache = NodeCache(capacity=100000)
+    cached_trie = Trie(db, root_hash, node_cache=cache)
+    db.gets = 0
+    for k, v in key_vals.items():
+        assert cached_trie.get(k) == v
+    first_gets = db.gets
+    assert 0 < first_gets < cache.misses + cache.hits
+
+    # Everything is served from the cache the second time
+    for k, v in key_vals.items():
+        assert cached_trie.get(k) == v
+    assert db.gets == first_gets
+    assert cache.hits >= first_gets
+
+    # Updates leave the cached nodes of the previous root intact
+    old_root = cached_trie.root_node
+    for k in list(key_vals)[:100]:
+        cached_trie.update(k, b'new')
+    for k, v in key_vals.items():
+        assert cached_trie.get(k, root_node=old_root) == v
+    assert Trie(db, cached_trie.root_hash).to_dict() == cached_trie.to_dict()
@@ -0,0 +1,73 @@
+from copy import deepcopy
+from sys import getsizeof
+
+from rlp import encode, decode
+
+from serializer.fast_rlp import FastRLPSerializer
+from serializer.rlp import RLPSerializer
+from trie.constants import NODE_TYPE_LEAF, NODE_TYPE_EXTENSION, \
+    NODE_TYPE_BRANCH
+from trie.nodes import BranchNode, LeafNode, ExtensionNode, to_node, \
+    to_list
+from trie.trie import Trie
+from trie.utils import pack_nibbles
+
+
+def test_to_node():
+    leaf = [pack_nibbles([1, 2, 16]), b'v']
+    extension = [pack_nibbles([3]), b'\x01' * 32]
+    branch = [b''] * 17
+    branch[1] = leaf
+    branch[16] = b'v'
+
+    node = to_node(branch)
+    assert isinstance(node, BranchNode)
+    assert isinstance(node[1], LeafNode)
+    assert node[1].path == [1, 2]
+    assert node == branch
+    assert Trie._get_node_type(node) == NODE_TYPE_BRANCH
+    assert Trie._get_node_type(node[1]) == NODE_TYPE_LEAF
+
+    node = to_node(extension)
+    assert isinstance(node, ExtensionNode)
+    assert node.path == [3]
+    assert Trie._get_node_type(node) == NODE_TYPE_EXTENSION
+    assert to_node(node) is node
+
+
+def test_nodes_serialize_as_lists():
+    leaf = LeafNode.from_path([1, 2, 3], b'value')
+    assert leaf == [pack_nibbles([1, 2, 3, 16]), b'value']
+    branch = BranchNode.blank()
+    branch[4] = leaf
+    extension = ExtensionNode.from_path([5, 6], branch)
+    assert to_list(extension) == \
+        [pack_nibbles([5, 6]), [b''] * 4 + [leaf.to_list()] + [b''] * 12]
+
+    for serializer in (RLPSerializer, FastRLPSerializer):
+        encoded = serializer.serialize_node(extension)
+        assert encoded == encode(to_list(extension))
+        assert serializer.deserialize_to_node(encoded) == extension
+        assert to_node(decode(encoded)) == extension
+
+    copied = deepcopy(extension)
+    assert copied == extension
+    assert copied.path == [5, 6]
+    assert isinstance(copied[1][4], LeafNode)
+
+
+def test_nodes_use_less_memory_than_lists():
+    leaf = [pack_nibbles([1, 2, 3, 16]), b'value']
+    branch = [b''] * 17
+    for item in (leaf, branch):
+        assert getsizeof(to_node(item)) < getsizeof(item)
+        assert not hasattr(to_node(item), '__dict__')
+
+
+def test_encoding_cleared_on_change():
+    branch = BranchNode.blank()
+    branch._hash = b'\x01' * 32
+    assert branch.is_encoded and branch.ref == b'\x01' * 32
+    branch[3] = b'\x02' * 32
+    assert not branch.is_encoded
+    assert branch.ref is branch
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from random import randint, sample
+
+import pytest
+
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.trie import Trie
+
+
+@pytest.mark.parametrize('executor_class',
+                         [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_parallel_commit(executor_class):
+    key_vals = {random_string(randint(1, 40)).encode():
+                random_string(randint(1, 100)).encode() for _ in range(3000)}
+    serial = Trie(EphemDB())
+    with executor_class(max_workers=4) as executor:
+        trie = Trie(EphemDB(), commit_executor=executor)
+        for t in (serial, trie):
+            t.update_many(key_vals)
+        assert trie.root_hash == serial.root_hash
+        assert trie.db.db == serial.db.db
+
+        # Keys under a common prefix, committed below an extension
+        deleted = sample(list(key_vals), 500)
+        for t in (serial, trie):
+            with t.batch():
+                for key in deleted:
+                    t.delete(key)
+                for i in range(500):
+                    t.update('prefix{}'.format(i).encode(), b'v')
+        assert trie.root_hash == serial.root_hash
+        assert trie.db.db == serial.db.db
+        assert trie.to_dict() == serial.to_dict()
+
+    with ThreadPoolExecutor() as executor:
+        prefixed = Trie(EphemDB(), commit_executor=executor)
+        prefixed.update_many({'prefix{}'.format(i).encode(): b'v'
+                              for i in range(500)})
+    assert prefixed.root_hash == Trie.from_sorted_items(
+        EphemDB(), sorted(prefixed.items())).root_hash
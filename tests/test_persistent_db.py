@@ -0,0 +1,146 @@
+import os
+from random import randint
+
+import pytest
+
+from serializer.serializer import sha3_hash
+from storage.mmap_db import MmapDB, INDEX_ENTRY
+from storage.refcount_db import RefcountDB
+from storage.sqlite_db import SqliteDB
+from tests.helper import random_string
+from trie.trie import Trie
+
+
+def sqlite_db(tempdir):
+    return SqliteDB(os.path.join(tempdir, 'trie.db'))
+
+
+def leveldb_db(tempdir):
+    leveldb = pytest.importorskip('storage.leveldb_db')
+    return leveldb.LevelDB(os.path.join(tempdir, 'trie.ldb'))
+
+
+def mmap_db(tempdir):
+    return MmapDB(os.path.join(tempdir, 'nodes'))
+
+
+# Keys of the length of node hashes, the only ones `MmapDB` accepts
+K1 = b'1' * 32
+K2 = b'2' * 32
+
+
+@pytest.fixture(params=[sqlite_db, leveldb_db, mmap_db])
+def open_db(request, tempdir):
+    return lambda: request.param(tempdir)
+
+
+def test_batched_writes(open_db):
+    db = open_db()
+    db.put(K1, b'v1')
+    db.put(K2, b'v2')
+    # Pending writes are visible before the commit
+    assert db.get(K1) == b'v1'
+    db.commit()
+    db.delete(K1)
+    db.put(K2, b'v22')
+    with pytest.raises(KeyError):
+        db.get(K1)
+    db.rollback()
+    assert db.get(K1) == b'v1'
+    db.delete(K1)
+    db.commit()
+    assert K1 not in db
+    assert db.get(K2) == b'v2'
+    db.close()
+
+
+def test_trie_persists(open_db):
+    key_vals = {random_string(randint(1, 40)).encode():
+                random_string(randint(1, 100)).encode() for _ in range(1000)}
+    db = open_db()
+    trie = Trie(db)
+    trie.update_many(key_vals)
+    root_hash = trie.root_hash
+    # Not committed to the db
+    trie.update(b'uncommitted', b'v')
+    db.close()
+
+    db = open_db()
+    trie = Trie(db, root_hash)
+    assert trie.to_dict() == key_vals
+    db.close()
+
+
+def test_pruning_persistent_db(open_db):
+    db = open_db()
+    trie = Trie(RefcountDB(db), prune=True)
+    key_vals = {random_string(randint(1, 40)).encode(): b'v'
+                for _ in range(300)}
+    trie.update_many(key_vals)
+    for key in list(key_vals)[:200]:
+        trie.delete(key)
+        del key_vals[key]
+    trie.commit()
+    db.close()
+
+    db = open_db()
+    trie = Trie(RefcountDB(db), trie.root_hash, prune=True)
+    assert trie.to_dict() == key_vals
+    trie.clear()
+    trie.commit()
+    db.close()
+
+
+def test_mmap_db_shared_files(tempdir):
+    path = os.path.join(tempdir, 'nodes')
+    writer = MmapDB(path)
+    reader = MmapDB(path)
+    trie = Trie(writer)
+    trie.update_many({b'k1': b'v1', b'k2': b'v2'})
+    root_hash = trie.root_hash
+    value = writer.get(root_hash)
+    assert isinstance(value, memoryview)
+
+    reader.refresh()
+    assert reader.get(root_hash) == value
+    assert Trie(reader, root_hash).to_dict() == {b'k1': b'v1', b'k2': b'v2'}
+
+    with pytest.raises(ValueError):
+        writer.put(b'short', b'v')
+
+
+def test_mmap_db_index_segments(tempdir):
+    path = os.path.join(tempdir, 'nodes')
+    db = MmapDB(path)
+    reader = MmapDB(path)
+    expected = {}
+    written = 0
+    segment_files = set()
+    commits, per_commit = 300, 10
+    for i in range(commits):
+        for j in range(per_commit):
+            key = sha3_hash(b'%d' % (i * per_commit + j))
+            db.put(key, b'v%d' % i)
+            expected[key] = b'v%d' % i
+        # Deletes of keys committed in older segments
+        for key in list(expected)[i:i + 2]:
+            db.delete(key)
+            del expected[key]
+        db.commit()
+        new_files = set(f for f in os.listdir(path) if f.endswith('.idx'))
+        written += sum(os.path.getsize(os.path.join(path, f))
+                       for f in new_files - segment_files)
+        segment_files = new_files
+
+    # Each commit rewrites a logarithmic share of the index, not all of it
+    total = commits * per_commit
+    assert written // INDEX_ENTRY.size < total * 12
+    assert len(segment_files) <= 12
+
+    reader.refresh()
+    for store in (db, reader, MmapDB(path)):
+        for key, value in expected.items():
+            assert store.get(key) == value
+        for key in (sha3_hash(b'%d' % i) for i in range(total)):
+            if key not in expected:
+                assert key not in store
@@ -0,0 +1,123 @@
+from random import randint, sample
+
+import pytest
+
+from serializer.serializer import sha3_hash
+from tests.helper import random_string
+from trie.exceptions import KeyNotFoundError
+from trie.proof import ProofVerifier, ProofResult, verify_proof, \
+    verify_proofs_parallel
+from trie.trie import Trie
+
+
+def test_proof_verifier(ephem_trie):
+    trie = ephem_trie
+    key_vals = {random_string(randint(1, 30)).encode():
+                random_string(randint(1, 100)).encode() for _ in range(2000)}
+    key_vals.update({b'91': b'v1', b'911': b'v11', b'9123': b'v123'})
+    trie.update_many(key_vals)
+
+    present = sample(list(key_vals), 100) + [b'91', b'911', b'9123']
+    missing = [k for k in [b'9', b'912', b'91234'] +
+               [random_string(randint(1, 30)).encode() for _ in range(50)]
+               if k not in key_vals]
+    _, proof = trie.get_multi(present + missing, with_proof=True)
+    proof_nodes = list(proof.values()) + [trie.root_node]
+
+    for nodes in (proof_nodes,
+                  [trie.node_serializer.serialize_node(n) for n in proof_nodes]):
+        verifier = ProofVerifier(trie.root_hash, nodes)
+        assert verifier.lookup_many(present) == \
+            [ProofResult(k, True, key_vals[k], None) for k in present]
+        assert verifier.lookup_many(missing) == \
+            [ProofResult(k, False, None, None) for k in missing]
+        assert verifier.verify_existence_multi_keys(
+            {k: key_vals[k] for k in present})
+        assert not verifier.verify_existence(present[0], b'other')
+        assert all(verifier.verify_absence(k) for k in missing)
+        assert not verifier.verify_absence(present[0])
+
+    # Keys whose path is not covered by the proof
+    _, proof = trie.get(b'91', with_proof=True)
+    verifier = ProofVerifier(trie.root_hash, proof + [trie.root_node])
+    other = next(k for k in key_vals if k[0] >> 4 != b'9'[0] >> 4)
+    result = verifier.lookup(other)
+    assert result.found is None
+    assert result.error.startswith('Missing node')
+    assert not verifier.verify_existence(other, key_vals[other])
+    assert not verifier.verify_absence(other)
+
+    verifier = ProofVerifier(trie.root_hash, proof)
+    assert verifier.lookup(b'91') == \
+        ProofResult(b'91', None, None,
+                    'Missing node {}'.format(trie.root_hash.hex()))
+
+
+def test_proof_verifier_blank_root(ephem_trie):
+    with pytest.raises(KeyNotFoundError):
+        ephem_trie.get(b'k')
+    verifier = ProofVerifier(ephem_trie.BLANK_ROOT, [])
+    assert verifier.verify_absence(b'k')
+    assert not verifier.verify_existence(b'k', b'')
+
+
+def test_proof_verifier_malformed_nodes(ephem_trie):
+    trie = ephem_trie
+    trie.update_many({b'k1': b'v1' * 20, b'k2': b'v2' * 20})
+    _, proof = trie.get(b'k1', with_proof=True)
+    proof.append(trie.root_node)
+    # Unreferenced malformed nodes are ignored
+    for extra in ([b''], [b'', b'', b''], [[b'']], b'\xc1'):
+        assert Trie.verify_proof_of_existence(trie.root_hash, b'k1',
+                                              b'v1' * 20, proof + [extra])
+
+    # Referenced malformed nodes fail the lookup
+    for bad in ([b''], b'\xc1'):
+        encoded = bad if isinstance(bad, bytes) else \
+            trie.node_serializer.serialize_node(bad)
+        result = ProofVerifier(sha3_hash(encoded), [bad]).lookup(b'k1')
+        assert result.found is None
+        assert result.error.startswith('Malformed proof node')
+
+
+def test_verify_proofs_parallel(ephem_trie):
+    trie = ephem_trie
+    key_vals = {random_string(randint(1, 30)).encode():
+                random_string(randint(1, 100)).encode() for _ in range(500)}
+    trie.update_many(key_vals)
+
+    def encoded(nodes):
+        return [trie.node_serializer.serialize_node(n) for n in nodes]
+
+    proofs = []
+    expected = []
+    for i, (key, value) in enumerate(key_vals.items()):
+        _, nodes = trie.get(key, with_proof=True)
+        nodes = nodes + [trie.root_node]
+        # Nodes or their encodings, some with a wrong value
+        if i % 3 == 0:
+            proofs.append((trie.root_hash, key, b'wrong', nodes))
+            expected.append(False)
+        else:
+            proofs.append((trie.root_hash, key, value,
+                           encoded(nodes) if i % 2 else nodes))
+            expected.append(True)
+    for key in (b'absent1', b'absent2'):
+        with pytest.raises(KeyNotFoundError) as err:
+            trie.get(key, with_proof=True)
+        nodes = encoded(err.value.proof_nodes + [trie.root_node])
+        proofs.append((trie.root_hash, key, None, nodes))
+        expected.append(True)
+        proofs.append((trie.root_hash, key, b'v', nodes))
+        expected.append(False)
+
+    # Malformed proofs
+    proofs[10:10] = [(trie.root_hash, b'k', b'v'),
+                     (trie.root_hash, 1, b'v', []),
+                     (trie.root_hash, b'k', b'v', None),
+                     (trie.root_hash, b'k', b'v', [b'\xc1', [b'']])]
+    expected[10:10] = [False] * 4
+
+    assert [verify_proof(p) for p in proofs] == expected
+    assert verify_proofs_parallel(proofs, max_workers=2, chunksize=16) == \
+        expected
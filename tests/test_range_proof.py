@@ -0,0 +1,90 @@
+from random import randint, sample
+
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.proof import ProofVerifier
+from trie.trie import Trie
+
+
+def build_trie(count):
+    key_vals = {random_string(randint(1, 20)).encode():
+                random_string(randint(1, 60)).encode() for _ in range(count)}
+    # Keys which are prefixes of other keys
+    key_vals.update({b'91': b'v1', b'911': b'v11', b'9123': b'v123'})
+    trie = Trie(EphemDB())
+    trie.update_many(key_vals)
+    return trie, sorted(key_vals.items())
+
+
+def test_range_proof():
+    trie, items = build_trie(2000)
+    _, full_proof = trie.get_keys_with_prefix(b'', with_proof=True)
+    root = trie.root_hash
+
+    bounds = [(b'', b'\xff'), (b'91', b'9123'), (b'0', b'0'), (b'zz', b'a')]
+    for _ in range(20):
+        bounds.append(tuple(sorted(k for k, _ in sample(items, 2))))
+        bounds.append(tuple(sorted(random_string(randint(1, 5)).encode()
+                                   for _ in range(2))))
+
+    for start, end in bounds:
+        expected = [(k, v) for k, v in items if start <= k <= end]
+        assert trie.get_range(start, end) == expected
+        rng, proof = trie.get_range(start, end, with_proof=True)
+        assert rng == expected
+        assert len(proof) <= len(full_proof)
+        proof.append(trie.root_node)
+        assert Trie.verify_range_proof(root, start, end, rng, proof)
+
+        if rng:
+            # A missing pair
+            assert not Trie.verify_range_proof(root, start, end, rng[1:], proof)
+            # A changed value
+            changed = [(rng[0][0], rng[0][1] + b'x')] + rng[1:]
+            assert not Trie.verify_range_proof(root, start, end, changed, proof)
+        # A key which is not in the trie
+        extra = [(end, b'x')] + [(k, v) for k, v in rng if k != end]
+        assert not Trie.verify_range_proof(root, start, end, extra, proof)
+
+
+def test_range_proof_is_small():
+    trie, items = build_trie(5000)
+    start, end = items[2000][0], items[2010][0]
+    rng, proof = trie.get_range(start, end, with_proof=True)
+    assert len(rng) == 11
+    # Two boundary paths and the leaves of the range at most
+    assert len(proof) < 2 * 8 + 11
+    proof.append(trie.root_node)
+    assert Trie.verify_range_proof(trie.root_hash, start, end, rng, proof)
+
+
+def test_range_proof_of_blank_trie():
+    trie = Trie(EphemDB())
+    rng, proof = trie.get_range(b'a', b'z', with_proof=True)
+    assert rng == [] and proof == []
+    assert Trie.verify_range_proof(trie.BLANK_ROOT, b'a', b'z', rng, proof)
+    assert not Trie.verify_range_proof(trie.BLANK_ROOT, b'a', b'z',
+                                       [(b'b', b'v')], proof)
+
+
+def test_range_proof_incomplete(capsys):
+    trie, items = build_trie(2000)
+    start, end = items[500][0], items[600][0]
+    rng, proof = trie.get_range(start, end, with_proof=True)
+    proof.append(trie.root_node)
+    for i in (0, len(proof) // 2, len(proof) - 1):
+        assert not Trie.verify_range_proof(trie.root_hash, start, end, rng,
+                                           proof[:i] + proof[i + 1:])
+    assert capsys.readouterr().out == ''
+
+
+def test_range_proof_verifier():
+    trie, items = build_trie(2000)
+    start, end = items[500][0], items[600][0]
+    rng, proof = trie.get_range(start, end, with_proof=True)
+    proof.append(trie.root_node)
+    encoded = [trie.node_serializer.serialize_node(n) for n in proof]
+    for nodes in (proof, encoded, proof + [[b'']]):
+        verifier = ProofVerifier(trie.root_hash, nodes)
+        assert verifier.verify_range(start, end, rng)
+        assert not verifier.verify_range(start, end, rng[1:])
@@ -0,0 +1,43 @@
+from random import randint
+
+import pytest
+from rlp.exceptions import DecodingError
+
+from serializer.fast_rlp import FastRLPSerializer
+from serializer.rlp import RLPSerializer
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.trie import Trie
+
+
+def test_same_encoding_as_rlp():
+    key_vals = {random_string(randint(1, 40)).encode():
+                random_string(randint(0, 300)).encode() for _ in range(2000)}
+    trie = Trie(EphemDB())
+    trie.update_many(key_vals)
+    for encoded in trie.db.db.values():
+        node = RLPSerializer.deserialize_to_node(encoded)
+        assert FastRLPSerializer.serialize_node(node) == encoded
+        assert FastRLPSerializer.deserialize_to_node(encoded) == node
+        assert FastRLPSerializer.deserialize_to_node(memoryview(encoded)) == \
+            node
+
+    for item in (b'', b'\x00', b'\x7f', b'\x80', b'x' * 55, b'x' * 56,
+                 b'x' * 70000, [], [b'', []], [b'x' * 60, [b'y' * 60]]):
+        assert FastRLPSerializer.serialize_node(item) == \
+            RLPSerializer.serialize_node(item)
+        assert FastRLPSerializer.deserialize_to_node(
+            RLPSerializer.serialize_node(item)) == item
+
+    fast_trie = Trie(EphemDB(), node_serializer=FastRLPSerializer)
+    fast_trie.update_many(key_vals)
+    assert fast_trie.root_hash == trie.root_hash
+    assert fast_trie.db.db == trie.db.db
+    assert fast_trie.BLANK_ROOT == trie.BLANK_ROOT
+
+
+def test_decoding_errors():
+    encoded = RLPSerializer.serialize_node([b'x' * 40, [b'y', b'z' * 60]])
+    for bad in (b'', encoded[:-1], encoded + b'\x00', b'\xb8', b'\xc2\x81'):
+        with pytest.raises(DecodingError):
+            FastRLPSerializer.deserialize_to_node(bad)
@@ -0,0 +1,81 @@
+from random import randint, sample
+from threading import Thread
+
+from storage.ephem_db import EphemDB
+from tests.helper import random_string
+from trie.cache import NodeCache
+from trie.trie import Trie
+
+
+def test_snapshots_of_past_roots():
+    trie = Trie(EphemDB(), node_cache=NodeCache(1000))
+    blank = trie.at(trie.BLANK_ROOT)
+    states = []
+    key_vals = {}
+    for _ in range(10):
+        with trie.batch():
+            for _ in range(100):
+                key = random_string(randint(1, 20)).encode()
+                key_vals[key] = random_string(randint(1, 50)).encode()
+                trie.update(key, key_vals[key])
+            for key in sample(list(key_vals), 20):
+                trie.delete(key)
+                del key_vals[key]
+        states.append((trie.root_hash, dict(key_vals)))
+
+    assert blank.to_dict() == {}
+    assert list(blank.iter_prefix(b'')) == []
+    for root_hash, expected in states:
+        snapshot = trie.at(root_hash)
+        assert snapshot.to_dict() == expected
+        key, value = next(iter(expected.items()))
+        assert snapshot.get(key) == value
+        assert snapshot.get_multi(expected) == expected
+        assert snapshot.get_range(b'', b'\xff') == sorted(expected.items())
+        _, proof = snapshot.get(key, with_proof=True)
+        assert Trie.verify_proof_of_existence(root_hash, key, value,
+                                              proof + [snapshot.root_node])
+
+
+def test_snapshot_root_decoded_on_first_read():
+    trie = Trie(EphemDB())
+    snapshot = trie.at(b'\x01' * 32)
+    assert snapshot._root_node is None
+    trie.update(b'k', b'v')
+    assert trie.at(trie.root_hash).get(b'k') == b'v'
+
+
+def test_concurrent_reads_while_updating():
+    trie = Trie(EphemDB(), node_cache=NodeCache(500))
+    states = []
+    key_vals = {}
+
+    def update(count):
+        for _ in range(count):
+            with trie.batch():
+                for _ in range(50):
+                    key = random_string(randint(1, 20)).encode()
+                    key_vals[key] = random_string(randint(1, 50)).encode()
+                    trie.update(key, key_vals[key])
+            states.append((trie.root_hash, dict(key_vals)))
+
+    update(5)
+    errors = []
+
+    def read(snapshots):
+        try:
+            for _ in range(5):
+                for snapshot, expected in snapshots:
+                    assert snapshot.to_dict() == expected
+        except Exception as e:
+            errors.append(e)
+
+    snapshots = [(trie.at(root_hash), expected)
+                 for root_hash, expected in states]
+    readers = [Thread(target=read, args=(snapshots,)) for _ in range(4)]
+    for t in readers:
+        t.start()
+    update(20)
+    for t in readers:
+        t.join()
+    assert errors == []
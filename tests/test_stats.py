@@ -0,0 +1,73 @@
+from storage.ephem_db import EphemDB
+from storage.instrumented_db import InstrumentedDB
+from trie.cache import NodeCache
+from trie.stats import TrieStats
+from trie.trie import Trie
+
+
+def test_stats():
+    stats = TrieStats()
+    db = InstrumentedDB(EphemDB(), stats)
+    trie = Trie(db, stats=stats)
+    key_vals = {str(i).encode(): b'v' * 40 + str(i).encode()
+                for i in range(1000)}
+    trie.update_many(key_vals)
+
+    counters = stats.counters
+    assert counters['nodes_written'] == counters['db_puts'] > 0
+    # Each stored node is hashed once
+    assert counters['hashes'] == counters['nodes_written']
+    assert counters['bytes_written'] == counters['db_bytes_written'] == \
+        sum(len(v) for v in db.db.db.values())
+    assert stats.timings['update_many'].count == 1
+    assert stats.timings['update'].count == 1000
+    assert stats.timings['db_commit'].count == 1
+
+    with stats.scope() as block:
+        for key in list(key_vals)[:10]:
+            trie.get(key)
+    assert block.timings['get'].count == 10
+    assert block.counters['nodes_read'] == block.counters['db_gets'] > 0
+    assert 'update' not in block.timings
+    assert stats.timings['get'].count == 10
+    assert sum(stats.timings['get'].buckets) == 10
+
+    report = stats.to_dict()
+    assert report['counters']['db_gets'] == counters['db_gets']
+    assert report['timings']['get']['count'] == 10
+    stats.reset()
+    assert stats.to_dict() == {'counters': {}, 'timings': {}}
+
+
+def test_bulk_load_stats():
+    stats = TrieStats()
+    db = InstrumentedDB(EphemDB(), stats)
+    key_vals = {str(i).encode(): b'v' * 40 + str(i).encode()
+                for i in range(1000)}
+    trie = Trie.from_sorted_items(db, sorted(key_vals.items()), stats=stats)
+    assert trie.to_dict() == key_vals
+
+    counters = stats.counters
+    assert counters['nodes_written'] == counters['db_puts'] > 1000
+    assert counters['bytes_written'] == counters['db_bytes_written'] == \
+        sum(len(v) for v in db.db.db.values())
+    assert counters['hashes'] == counters['nodes_written']
+    assert stats.timings['from_sorted_items'].count == 1
+
+
+def test_cache_hits_recorded():
+    stats = TrieStats()
+    trie = Trie(EphemDB(), node_cache=NodeCache(), stats=stats)
+    trie.update_many({str(i).encode(): b'v' * 40 for i in range(100)})
+    trie.node_cache.clear()
+    trie.get(b'1')
+    reads = stats.counters['nodes_read']
+    trie.get(b'1')
+    assert stats.counters['nodes_read'] == reads
+    assert stats.counters['cache_hits'] > 0
+
+
+def test_no_stats(ephem_trie):
+    assert ephem_trie.stats is None
+    ephem_trie.update(b'k', b'v')
+    assert ephem_trie.get(b'k') == b'v'
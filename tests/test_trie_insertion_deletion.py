@@ -4,6 +4,8 @@ from random import randint
 import pytest
 
 from tests.helper import random_string
+from trie.exceptions import KeyNotFoundError
+from trie.trie import Trie
 
 
 def add_and_check_key_vals_to_trie(trie, key_vals):
@@ -144,3 +146,39 @@ def test_non_existing_keys_large(ephem_trie):
     for k in non_existent_keys:
         with pytest.raises(KeyError) as err:
             trie.get(k)
+
+
+def test_proof_of_absence(ephem_trie):
+    trie = ephem_trie
+    with pytest.raises(KeyNotFoundError) as err:
+        trie.get(b'k', with_proof=True)
+    assert Trie.verify_proof_of_absence(trie.BLANK_ROOT, b'k',
+                                        err.value.proof_nodes)
+
+    key_vals = {b'k1': b'v1', b'k2': b'v2', b'x3': b'v3', b'abcd1': b'x1',
+                b'abcd11': b'x4', b'abcd1111': b'x6', b'abcd11112': b'x7'}
+    for _ in range(500):
+        key_vals[random_string(randint(5, 40)).encode()] = \
+            random_string(randint(1, 100)).encode()
+    trie.update_many(key_vals)
+
+    # Missing keys ending at a branch, diverging in a branch, a leaf or an
+    # extension
+    missing = [b'k', b'k3', b'k11', b'abcd', b'abcd111', b'abce', b'x33']
+    missing += [random_string(randint(5, 40)).encode() for _ in range(200)]
+    for key in missing:
+        if key in key_vals:
+            continue
+        with pytest.raises(KeyNotFoundError) as err:
+            trie.get(key, with_proof=True)
+        proof = err.value.proof_nodes + [trie.root_node]
+        assert Trie.verify_proof_of_absence(trie.root_hash, key, proof)
+        # The proof does not hold for existing keys
+        for existing in (b'k1', b'abcd1111'):
+            assert not Trie.verify_proof_of_absence(trie.root_hash, existing,
+                                                    proof)
+
+    for key in key_vals:
+        _, proof = trie.get(key, with_proof=True)
+        proof.append(trie.root_node)
+        assert not Trie.verify_proof_of_absence(trie.root_hash, key, proof)
@@ -0,0 +1,120 @@
+from random import choice, randint, sample
+
+import pytest
+
+from storage.ephem_db import EphemDB
+from storage.refcount_db import RefcountDB
+from storage.write_buffer_db import WriteBufferDB
+from tests.helper import random_string
+from trie.trie import Trie
+
+
+def test_put_delete_cancel():
+    store = EphemDB()
+    db = WriteBufferDB(store)
+    db.put(b'k1', b'v1')
+    db.put(b'k2', b'v2')
+    db.delete(b'k1')
+    assert len(db) == 1
+    assert db.get(b'k2') == b'v2'
+    assert b'k1' not in db
+    assert store.db == {}
+    db.commit()
+    assert store.db == {b'k2': b'v2'}
+
+    # A delete hides a stored key until the commit removes it, even after
+    # a put of the key
+    db.put(b'k2', b'v22')
+    db.delete(b'k2')
+    with pytest.raises(KeyError):
+        db.get(b'k2')
+    assert b'k2' not in db
+    assert store.db == {b'k2': b'v2'}
+    db.put(b'k3', b'v3')
+    db.commit()
+    assert store.db == {b'k3': b'v3'}
+
+
+def test_same_as_direct_writes():
+    keys = [b'k%d' % i for i in range(20)]
+    direct, store = EphemDB(), EphemDB()
+    db = WriteBufferDB(store)
+    for _ in range(20):
+        for _ in range(30):
+            key = choice(keys)
+            if randint(0, 2) or key not in direct:
+                value = random_string(5).encode()
+                direct.put(key, value)
+                db.put(key, value)
+            else:
+                direct.delete(key)
+                db.delete(key)
+            for k in keys:
+                assert (k in db) == (k in direct)
+        db.commit()
+        assert store.db == direct.db
+
+
+def test_refcounting_put_delete_cancel():
+    store = EphemDB()
+    db = WriteBufferDB(store, refcounting=True)
+    db.put(b'k1', b'v1')
+    db.put(b'k2', b'v2')
+    db.delete(b'k1')
+    assert len(db) == 1
+    assert db.get(b'k2') == b'v2'
+    assert store.db == {}
+    db.commit()
+    assert store.db == {b'k2': b'v2'}
+
+    # A net delete is applied on commit only
+    db.delete(b'k2')
+    assert db.get(b'k2') == b'v2'
+    db.put(b'k3', b'v3')
+    db.commit()
+    assert store.db == {b'k3': b'v3'}
+
+
+class CountingDB(EphemDB):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def put(self, key, value):
+        self.writes += 1
+        super().put(key, value)
+
+    def delete(self, key):
+        self.writes += 1
+        super().delete(key)
+
+
+def test_buffer_over_refcount_db():
+    key_vals = {random_string(randint(1, 40)).encode():
+                random_string(randint(1, 100)).encode() for _ in range(500)}
+    deleted = sample(list(key_vals), 200)
+
+    stores = []
+    for buffered in (False, True):
+        store = CountingDB()
+        db = RefcountDB(store)
+        if buffered:
+            db = WriteBufferDB(db, refcounting=True)
+        trie = Trie(db, prune=True)
+        for k, v in key_vals.items():
+            trie.update(k, v)
+        for key in deleted:
+            trie.delete(key)
+        if buffered:
+            assert store.db == {}
+        trie.commit()
+        stores.append(store)
+
+    for key in deleted:
+        del key_vals[key]
+    built = Trie.from_sorted_items(EphemDB(), sorted(key_vals.items()))
+    assert trie.root_hash == built.root_hash
+    assert set(stores[1].db) == set(stores[0].db) == set(built.db.db)
+    assert Trie(db, trie.root_hash).to_dict() == key_vals
+    # Nodes replaced before the commit were never written
+    assert stores[1].writes < stores[0].writes / 5
@@ -0,0 +1,229 @@
+import asyncio
+
+from serializer.rlp import RLPSerializer
+from storage.async_db import ExecutorDB
+from trie.constants import BLANK_NODE, NODE_TYPE_BLANK, NODE_TYPE_LEAF, \
+    NODE_TYPE_BRANCH
+from trie.exceptions import KeyNotFoundError
+from trie.nodes import TrieNode, to_node
+from trie.trie import Trie
+
+
+class AsyncTrie:
+    """Read-only asyncio view of a trie at a root, reading the nodes from an
+    async db, see `storage.async_db`. Lookups, prefix queries and proofs
+    return the same results as the ones of `Trie`. Where a query needs
+    several children of a branch, they are fetched concurrently.
+    """
+
+    def __init__(self, db, root_hash=None, node_serializer=RLPSerializer,
+                 node_cache=None):
+        """
+        :param db: async db
+        :param node_cache: `NodeCache`, it can be shared with sync tries
+        """
+        self.db = db
+        self.node_serializer = node_serializer
+        self.node_cache = node_cache
+        self.BLANK_ROOT = node_serializer.hash_node(BLANK_NODE)[0]
+        self.set_root_hash(root_hash)
+
+    @classmethod
+    def from_trie(cls, trie, executor=None):
+        """
+        :return: `AsyncTrie` at the last committed root of `trie`, reading
+        its db in `executor` and sharing its node cache
+        """
+        return cls(ExecutorDB(trie.db, executor), trie.root_hash,
+                   node_serializer=trie.node_serializer,
+                   node_cache=trie.node_cache)
+
+    def set_root_hash(self, root_hash=None):
+        self.root_hash = self.BLANK_ROOT if root_hash is None else root_hash
+        self._root_node = None
+
+    async def get_root_node(self):
+        if self._root_node is None:
+            if self.root_hash == self.BLANK_ROOT:
+                self._root_node = BLANK_NODE
+            else:
+                self._root_node = await self._decode_to_node(self.root_hash)
+        return self._root_node
+
+    async def aget(self, key, with_proof=False):
+        """see `Trie.get`
+        :raises KeyNotFoundError: if `key` is not in the trie, with the proof
+        of its absence if `with_proof` is True
+        """
+        proof_nodes = [] if with_proof else None
+        node = await self.get_root_node()
+        nibbles = Trie.key_to_nibbles(key)
+        depth = 0
+        while True:
+            node_type = Trie._get_node_type(node)
+            if node_type == NODE_TYPE_BLANK:
+                raise KeyNotFoundError(proof_nodes=proof_nodes)
+
+            if node_type == NODE_TYPE_BRANCH:
+                if depth == len(nibbles):
+                    if node[16] == BLANK_NODE:
+                        raise KeyNotFoundError(proof_nodes=proof_nodes)
+                    value = node[16]
+                    break
+                ref = node[nibbles[depth]]
+                if ref == BLANK_NODE:
+                    raise KeyNotFoundError(proof_nodes=proof_nodes)
+                depth += 1
+            else:
+                curr_key = Trie.key_nibbles_from_key_value_node(node)
+                rest = nibbles[depth:]
+                if node_type == NODE_TYPE_LEAF:
+                    if rest != curr_key:
+                        raise KeyNotFoundError(proof_nodes=proof_nodes)
+                    value = node[1]
+                    break
+                if not rest.startswith(curr_key):
+                    raise KeyNotFoundError(proof_nodes=proof_nodes)
+                ref = node[1]
+                depth += len(curr_key)
+            node = await self._get_node(ref, proof_nodes)
+
+        if with_proof:
+            return value, proof_nodes
+        else:
+            return value
+
+    async def aget_multi(self, keys, with_proof=False):
+        """see `Trie.get_multi`, the proof is a dict of nodes by hash"""
+        proof_nodes = {} if with_proof else None
+        values = {}
+        keys = sorted(set(keys))
+        await self._get_multi(await self.get_root_node(),
+                              [(Trie.key_to_nibbles(key), key)
+                               for key in keys],
+                              0, values, proof_nodes)
+        if with_proof:
+            return values, proof_nodes
+        else:
+            return values
+
+    async def aget_keys_with_prefix(self, key_prefix, with_proof=False):
+        """see `Trie.get_keys_with_prefix`
+        :return: dict of the keys starting with `key_prefix` and their values
+        """
+        proof_nodes = [] if with_proof else None
+        items = {}
+        prefix = Trie.key_to_nibbles(key_prefix)
+        node = await self.get_root_node()
+        depth = 0
+        while node != BLANK_NODE and depth < len(prefix):
+            node_type = Trie._get_node_type(node)
+            if node_type == NODE_TYPE_BRANCH:
+                ref = node[prefix[depth]]
+                depth += 1
+                node = BLANK_NODE if ref == BLANK_NODE else \
+                    await self._get_node(ref, proof_nodes)
+                continue
+            curr_key = Trie.key_nibbles_from_key_value_node(node)
+            rest = prefix[depth:]
+            if curr_key.startswith(rest):
+                # All the keys below the node start with the prefix
+                break
+            if node_type == NODE_TYPE_LEAF or not rest.startswith(curr_key):
+                node = BLANK_NODE
+                break
+            depth += len(curr_key)
+            node = await self._get_node(node[1], proof_nodes)
+
+        if node != BLANK_NODE:
+            await self._collect(node, prefix[:depth], items,
+                                proof_nodes)
+        if with_proof:
+            return items, proof_nodes
+        else:
+            return items
+
+    async def _get_multi(self, node, keys, depth, values, proof_nodes):
+        node_type = Trie._get_node_type(node)
+
+        if node_type == NODE_TYPE_BRANCH:
+            children = {}
+            for nibbles, key in keys:
+                if len(nibbles) == depth:
+                    if node[16] != BLANK_NODE:
+                        values[key] = node[16]
+                else:
+                    children.setdefault(nibbles[depth], []).append(
+                        (nibbles, key))
+            await asyncio.gather(*(
+                self._get_multi_ref(node[index], sub_keys, depth + 1, values,
+                                    proof_nodes)
+                for index, sub_keys in children.items()
+                if node[index] != BLANK_NODE))
+
+        elif node_type != NODE_TYPE_BLANK:
+            curr_key = Trie.key_nibbles_from_key_value_node(node)
+            if node_type == NODE_TYPE_LEAF:
+                for nibbles, key in keys:
+                    if nibbles[depth:] == curr_key:
+                        values[key] = node[1]
+            else:
+                sub_keys = [(nibbles, key) for nibbles, key in keys
+                            if nibbles[depth:].startswith(curr_key)]
+                if sub_keys:
+                    await self._get_multi_ref(node[1], sub_keys,
+                                              depth + len(curr_key), values,
+                                              proof_nodes)
+
+    async def _get_multi_ref(self, ref, keys, depth, values, proof_nodes):
+        node = await self._get_node(ref, proof_nodes)
+        await self._get_multi(node, keys, depth, values, proof_nodes)
+
+    async def _collect(self, node, path, items, proof_nodes):
+        """add the (key, value) pairs in and below `node` to the dict `items`
+        :param path: `NibblePath` of the node
+        """
+        node_type = Trie._get_node_type(node)
+        if node_type == NODE_TYPE_BRANCH:
+            if node[16] != BLANK_NODE:
+                items[path.to_bytes()] = node[16]
+            # The children are fetched concurrently
+            await asyncio.gather(*(
+                self._collect_ref(node[i], path + (i,), items, proof_nodes)
+                for i in range(16) if node[i] != BLANK_NODE))
+        elif node_type != NODE_TYPE_BLANK:
+            path = path + Trie.key_nibbles_from_key_value_node(node)
+            if node_type == NODE_TYPE_LEAF:
+                items[path.to_bytes()] = node[1]
+            else:
+                await self._collect_ref(node[1], path, items, proof_nodes)
+
+    async def _collect_ref(self, ref, path, items, proof_nodes):
+        node = await self._get_node(ref, proof_nodes)
+        await self._collect(node, path, items, proof_nodes)
+
+    async def _get_node(self, ref, proof_nodes=None):
+        """decode the referenced node and add it to `proof_nodes`, a list or
+        a dict by hash, if it is hashed
+        """
+        node = await self._decode_to_node(ref)
+        if proof_nodes is not None and not isinstance(ref, TrieNode):
+            if isinstance(proof_nodes, dict):
+                proof_nodes[ref] = node
+            else:
+                proof_nodes.append(node)
+        return node
+
+    async def _decode_to_node(self, encoded):
+        if isinstance(encoded, (list, TrieNode)):
+            return to_node(encoded)
+        if self.node_cache is not None:
+            node = self.node_cache.get(encoded)
+            if node is not None:
+                return node
+        serz = await self.db.get(encoded)
+        node = to_node(self.node_serializer.deserialize_to_node(serz))
+        Trie._set_encoding(node, encoded, serz)
+        if self.node_cache is not None:
+            self.node_cache.put(encoded, node)
+        return node
@@ -0,0 +1,117 @@
+from serializer.rlp import RLPSerializer
+from serializer.serializer import sha3_hash
+from trie.constants import BLANK_NODE
+from trie.nibble_path import NibblePath
+from trie.nodes import BranchNode, LeafNode, ExtensionNode
+from trie.utils import str_to_bytes
+
+
+class TrieBuilder:
+    """Build a trie bottom-up from key/value pairs sorted by key.
+    A node is encoded (and stored if it is hashed) exactly once, as soon as
+    no later key can change it. The root is the same as the one obtained by
+    inserting the pairs one by one with `Trie.update`.
+    """
+
+    def __init__(self, db=None, node_serializer=RLPSerializer, stats=None):
+        """
+        :param db: database to store the hashed nodes in, nothing is stored
+        if None
+        :param stats: `TrieStats` counting the hashes computed and the nodes
+        written
+        """
+        self.db = db
+        self.node_serializer = node_serializer
+        self.stats = stats
+        # Open branches on the path of the pending key as [depth, node],
+        # depth being the number of nibbles leading to the branch
+        self._stack = []
+        # The last (nibbles, value) added, it cannot be placed until the
+        # next key tells where it diverges
+        self._pending = None
+
+    def add(self, key, value):
+        self.add_nibbles(NibblePath(str_to_bytes(key)), value)
+
+    def add_nibbles(self, nibbles, value):
+        """
+        :param nibbles: key nibbles without terminator, must be greater than
+        the ones of the previously added key
+        """
+        nibbles = NibblePath.from_nibbles(nibbles)
+        if self._pending is None:
+            self._pending = (nibbles, value)
+            return
+
+        prev, prev_value = self._pending
+        if nibbles <= prev:
+            raise ValueError('Keys must be added in strictly increasing order')
+
+        # A branch is needed where the new key diverges from the previous one
+        common = prev.common_prefix_length(nibbles)
+        stack = self._stack
+        if not stack or stack[-1][0] < common:
+            stack.append([common, BranchNode.blank()])
+        self._add_leaf(stack[-1], prev, prev_value)
+
+        # Branches deeper than the divergence point are complete
+        while stack[-1][0] > common:
+            depth, node = stack.pop()
+            if not stack or stack[-1][0] < common:
+                stack.append([common, BranchNode.blank()])
+            self._add_branch(stack[-1], prev, depth, node)
+
+        self._pending = (nibbles, value)
+
+    def finish(self):
+        """
+        :return: root node, its children are encoded
+        """
+        if self._pending is None:
+            return BLANK_NODE
+
+        nibbles, value = self._pending
+        self._pending = None
+        stack = self._stack
+        if not stack:
+            return LeafNode.from_path(nibbles, value)
+
+        self._add_leaf(stack[-1], nibbles, value)
+        while len(stack) > 1:
+            depth, node = stack.pop()
+            self._add_branch(stack[-1], nibbles, depth, node)
+        depth, node = stack.pop()
+        return self._with_extension(node, nibbles[:depth])
+
+    def _add_leaf(self, frame, nibbles, value):
+        depth, node = frame
+        if len(nibbles) == depth:
+            node[16] = value
+        else:
+            leaf = LeafNode.from_path(nibbles[depth + 1:], value)
+            node[nibbles[depth]] = self._encode_node(leaf)
+
+    def _add_branch(self, frame, nibbles, depth, node):
+        parent_depth, parent = frame
+        sub_node = self._with_extension(node, nibbles[parent_depth + 1:depth])
+        parent[nibbles[parent_depth]] = self._encode_node(sub_node)
+
+    def _with_extension(self, node, nibbles):
+        if not nibbles:
+            return node
+        return ExtensionNode.from_path(nibbles, self._encode_node(node))
+
+    def _encode_node(self, node):
+        encoded = self.node_serializer.serialize_node(node)
+        if len(encoded) < 32:
+            return node
+
+        hashkey = sha3_hash(encoded)
+        if self.stats is not None:
+            self.stats.incr('hashes')
+        if self.db is not None:
+            self.db.put(hashkey, encoded)
+            if self.stats is not None:
+                self.stats.incr('nodes_written')
+                self.stats.incr('bytes_written', len(encoded))
+        return hashkey
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class NodeCache:
+    """Bounded cache of decoded nodes keyed by their hash, the least recently
+    used node is evicted first. Nodes are content addressed so an entry never
+    goes stale and a cache can be shared by tries over the same db.
+    Cached nodes must not be modified. The cache can be used from several
+    threads.
+    """
+
+    def __init__(self, capacity=10000):
+        if capacity <= 0:
+            raise ValueError('Capacity must be positive')
+        self.capacity = capacity
+        self._nodes = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        :return: the node or None if it is not cached
+        """
+        with self._lock:
+            try:
+                node = self._nodes[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._nodes.move_to_end(key)
+            self.hits += 1
+            return node
+
+    def put(self, key, node):
+        with self._lock:
+            self._nodes[key] = node
+            self._nodes.move_to_end(key)
+            if len(self._nodes) > self.capacity:
+                self._nodes.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._nodes.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, key):
+        return key in self._nodes
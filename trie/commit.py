@@ -0,0 +1,83 @@
+from itertools import repeat
+
+from serializer.rlp import RLPSerializer
+from serializer.serializer import sha3_hash
+from trie.nodes import BranchNode, ExtensionNode, TrieNode, EMBEDDED
+
+
+def commit_node(node, writes, node_serializer=RLPSerializer, node_cache=None,
+                stats=None):
+    """encode `node` after its modified descendants, bottom-up
+    :param writes: list collecting (hash, encoded node) pairs to store
+    :param node_cache: `NodeCache` the hashed nodes are put in
+    :param stats: `TrieStats` counting the hashes computed
+    :return: reference to the node as kept by its parent, the hash or the
+    node itself if its encoding is shorter than 32 bytes
+    """
+    if node.is_encoded:
+        # unchanged since it was last encoded
+        return node.ref
+
+    commit_children(node, writes, node_serializer, node_cache, stats)
+    encoded = node_serializer.serialize_node(node)
+    if len(encoded) < 32:
+        node._hash = EMBEDDED
+        return node
+
+    hashkey = sha3_hash(encoded)
+    if stats is not None:
+        stats.incr('hashes')
+    node._hash = hashkey
+    writes.append((hashkey, encoded))
+    if node_cache is not None:
+        node_cache.put(hashkey, node)
+    return hashkey
+
+
+def commit_children(node, writes, node_serializer=RLPSerializer,
+                    node_cache=None, stats=None):
+    """replace the modified children of `node`, which are kept in memory
+    as nodes, with their references
+    """
+    if isinstance(node, BranchNode):
+        for i, child in enumerate(node.items()[:16]):
+            if isinstance(child, TrieNode):
+                node[i] = commit_node(child, writes, node_serializer,
+                                      node_cache, stats)
+    elif isinstance(node, ExtensionNode) and isinstance(node[1], TrieNode):
+        node[1] = commit_node(node[1], writes, node_serializer, node_cache,
+                              stats)
+
+
+def commit_subtree(node, node_serializer=RLPSerializer):
+    """commit a subtree on its own, it runs in worker threads or processes
+    :return: (reference to the node, list of (hash, encoded node) to store)
+    """
+    writes = []
+    return commit_node(node, writes, node_serializer), writes
+
+
+def commit_children_parallel(node, writes, executor,
+                             node_serializer=RLPSerializer, stats=None):
+    """commit the modified subtrees below the topmost branch of `node` with
+    `executor`, one task per child of the branch. The references are set in
+    the branch and the writes collected in the calling thread.
+    :param stats: `TrieStats` counting the hashes computed, one per node
+    written by the tasks
+    """
+    while isinstance(node, ExtensionNode) and isinstance(node[1], TrieNode):
+        node = node[1]
+    if not isinstance(node, BranchNode):
+        return
+
+    dirty = [i for i in range(16)
+             if isinstance(node[i], TrieNode) and not node[i].is_encoded]
+    if len(dirty) < 2:
+        return
+    results = executor.map(commit_subtree, [node[i] for i in dirty],
+                           repeat(node_serializer))
+    for i, (ref, sub_writes) in zip(dirty, results):
+        node[i] = ref
+        writes.extend(sub_writes)
+        if stats is not None:
+            stats.incr('hashes', len(sub_writes))
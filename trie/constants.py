@@ -2,6 +2,9 @@ NIBBLE_TERMINATOR = 16
 
 hex_to_int = {c: i for i, c in enumerate('0123456789abcdef')}
 
+# Table for `bytes.translate` from hex digits to nibble values
+HEX_TO_NIBBLE = bytes.maketrans(b'0123456789abcdef', bytes(range(16)))
+
 TT256 = 2 ** 256
 
 
@@ -0,0 +1,9 @@
+class KeyNotFoundError(KeyError):
+    """Raised when a key is not in the trie. `proof_nodes` proves the absence
+    of the key if the lookup was made with a proof: the nodes on the path of
+    the key up to the node where it diverges, except the root node.
+    """
+
+    def __init__(self, *args, proof_nodes=None):
+        super().__init__(*args)
+        self.proof_nodes = proof_nodes
@@ -0,0 +1,207 @@
+from functools import total_ordering
+
+from trie.constants import HEX_TO_NIBBLE
+
+
+@total_ordering
+class NibblePath:
+    """Immutable sequence of nibbles stored two per byte in `data`, starting
+    at nibble `offset`. Slicing shares `data` so paths of keys and of packed
+    node keys are used without copying them to lists of nibbles.
+    Compares equal to the list of its nibbles.
+    """
+    __slots__ = ('_data', '_offset', '_length')
+
+    def __init__(self, data=b'', offset=0, length=None):
+        self._data = data
+        self._offset = offset
+        self._length = len(data) * 2 - offset if length is None else length
+
+    @classmethod
+    def from_nibbles(cls, nibbles):
+        """
+        :param nibbles: sequence of nibbles without terminator, returned as
+        is if already a NibblePath
+        """
+        if isinstance(nibbles, cls):
+            return nibbles
+        nibbles = list(nibbles)
+        length = len(nibbles)
+        odd = length % 2
+        if odd:
+            nibbles.insert(0, 0)
+        return cls(bytes(16 * nibbles[i] + nibbles[i + 1]
+                         for i in range(0, len(nibbles), 2)), odd, length)
+
+    @classmethod
+    def from_packed(cls, bindata):
+        """unpack a hex prefix encoded path
+        :param bindata: binary packed from nibbles by `to_packed`
+        :return: (path, True if the path has a terminator)
+        """
+        flags = bindata[0] >> 4
+        return cls(bindata, 1 if flags & 1 else 2), bool(flags & 2)
+
+    @classmethod
+    def _from_value(cls, value, length):
+        """
+        :param value: the nibbles of the path as an integer
+        """
+        return cls(value.to_bytes((length + 1) >> 1, 'big'), length & 1,
+                   length)
+
+    def _value(self, length=None):
+        """
+        :return: the first `length` nibbles, all by default, as an integer
+        """
+        if length is None:
+            length = self._length
+        end = self._offset + length
+        value = int.from_bytes(self._data[self._offset >> 1:(end + 1) >> 1],
+                               'big')
+        if end & 1:
+            value >>= 4
+        return value & ((1 << 4 * length) - 1)
+
+    def to_packed(self, terminator=False):
+        """hex prefix encoding of the path, see `trie.utils.pack_nibbles`
+        """
+        flags = 2 if terminator else 0
+        data, offset, length = self._data, self._offset, self._length
+        end = (offset + length) >> 1
+        if not (offset | length) & 1:
+            return bytes((flags << 4,)) + data[offset >> 1:end]
+        if offset & length & 1:
+            first = data[offset >> 1] & 15
+            return bytes(((flags | 1) << 4 | first,)) + \
+                data[(offset >> 1) + 1:end]
+        # The nibbles are shifted by one in the bytes
+        flags = flags | 1 if length & 1 else flags << 4
+        return (flags << 4 * length | self._value()).to_bytes(
+            (length >> 1) + 1, 'big')
+
+    def to_bytes(self):
+        """
+        :return: the bytes the path represents, the length must be even
+        """
+        if self._length % 2:
+            raise ValueError('Path has an odd number of nibbles')
+        start = self._offset >> 1
+        if not self._offset & 1:
+            return self._data[start:start + (self._length >> 1)]
+        return self._value().to_bytes(self._length >> 1, 'big')
+
+    def tolist(self):
+        start = self._offset & 1
+        hex_str = self._data[self._offset >> 1:
+                             (self._offset + self._length + 1) >> 1].hex()
+        return list(hex_str[start:start + self._length].encode()
+                    .translate(HEX_TO_NIBBLE))
+
+    def common_prefix_length(self, other):
+        if not isinstance(other, NibblePath):
+            other = NibblePath.from_nibbles(other)
+        length = min(self._length, other._length)
+        a_offset, b_offset = self._offset, other._offset
+        if (a_offset ^ b_offset) & 1:
+            # Nibbles are not at the same position in the bytes
+            diff = self._value(length) ^ other._value(length)
+            return length - (diff.bit_length() + 3) // 4
+
+        i = 0
+        if a_offset & 1 and length:
+            if (self._data[a_offset >> 1] ^ other._data[b_offset >> 1]) & 15:
+                return 0
+            i = 1
+        # Compare the whole bytes at once
+        size = (length - i) >> 1
+        a_start, b_start = (a_offset + i) >> 1, (b_offset + i) >> 1
+        a = self._data[a_start:a_start + size]
+        b = other._data[b_start:b_start + size]
+        if a != b:
+            diff = int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')
+            return i + (size * 8 - diff.bit_length()) // 4
+        i += size * 2
+        if i < length and self[i] == other[i]:
+            i += 1
+        return i
+
+    def startswith(self, prefix):
+        return len(prefix) <= self._length and \
+            self.common_prefix_length(prefix) == len(prefix)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return NibblePath.from_nibbles(self.tolist()[index])
+            return NibblePath(self._data, self._offset + start,
+                              max(stop - start, 0))
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('NibblePath index out of range')
+        index += self._offset
+        byte = self._data[index >> 1]
+        return byte & 15 if index & 1 else byte >> 4
+
+    def __iter__(self):
+        data = self._data
+        for index in range(self._offset, self._offset + self._length):
+            byte = data[index >> 1]
+            yield byte & 15 if index & 1 else byte >> 4
+
+    @staticmethod
+    def _nibbles_value(nibbles):
+        """
+        :return: (nibbles as an integer, number of nibbles)
+        """
+        if isinstance(nibbles, NibblePath):
+            return nibbles._value(), nibbles._length
+        value = 0
+        for nibble in nibbles:
+            value = value << 4 | nibble
+        return value, len(nibbles)
+
+    def __add__(self, other):
+        if not isinstance(other, (NibblePath, list, tuple)):
+            return NotImplemented
+        value, length = self._nibbles_value(other)
+        if not length:
+            return self
+        if not self._length:
+            return NibblePath._from_value(value, length)
+        return NibblePath._from_value(self._value() << 4 * length | value,
+                                      self._length + length)
+
+    def __radd__(self, other):
+        if not isinstance(other, (list, tuple)):
+            return NotImplemented
+        value, length = self._nibbles_value(other)
+        return NibblePath._from_value(value << 4 * self._length |
+                                      self._value(), length + self._length)
+
+    def __eq__(self, other):
+        if isinstance(other, NibblePath):
+            return self._length == other._length and \
+                self.common_prefix_length(other) == self._length
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if not isinstance(other, (NibblePath, list, tuple)):
+            return NotImplemented
+        common = self.common_prefix_length(other)
+        if common == min(self._length, len(other)):
+            return self._length < len(other)
+        return self[common] < other[common]
+
+    def __hash__(self):
+        return hash(tuple(self.tolist()))
+
+    def __repr__(self):
+        return 'NibblePath({})'.format(self.tolist())
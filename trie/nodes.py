@@ -0,0 +1,184 @@
+from operator import attrgetter
+
+from trie.constants import NODE_TYPE_LEAF, NODE_TYPE_EXTENSION, \
+    NODE_TYPE_BRANCH
+from trie.nibble_path import NibblePath
+
+# `_hash` of the nodes encoded in less than 32 bytes, which are embedded in
+# their parent instead of being referenced by hash
+EMBEDDED = b''
+
+
+class TrieNode:
+    """Base of the in-memory nodes. The items of a node are kept in slots,
+    which takes less memory than the lists the nodes are serialized as, and
+    the type is known from the class. Nodes are indexed like those lists,
+    compare equal to them and are converted to them by the serializers only.
+    A node must not be modified once it is referenced from a trie.
+
+    Once serialized, a node keeps its hash, or EMBEDDED if its encoding is
+    short enough to be embedded in its parent, so unchanged nodes are not
+    encoded again. It is cleared when an item is set.
+    """
+    __slots__ = ('_hash',)
+    node_type = None
+
+    @property
+    def is_encoded(self):
+        return self._hash is not None
+
+    @property
+    def ref(self):
+        """reference to the node as kept by its parent, only valid once the
+        node is encoded
+        """
+        return self._hash or self
+
+    def items(self):
+        """
+        :return: tuple of the items of the node, as serialized
+        """
+        raise NotImplementedError
+
+    def to_list(self):
+        return [x.to_list() if isinstance(x, TrieNode) else x
+                for x in self.items()]
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, TrieNode):
+            return self.items() == other.items()
+        if isinstance(other, list):
+            return list(self.items()) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, list(self.items()))
+
+
+# Slots of the 16 children and of the value of a branch, in serialized order
+BRANCH_SLOTS = tuple('_{:x}'.format(i) for i in range(16)) + ('value',)
+_branch_items = attrgetter(*BRANCH_SLOTS)
+_key_value_items = attrgetter('key', 'value')
+
+
+class BranchNode(TrieNode):
+    """[v0, v1, .., v15, value]
+    """
+    __slots__ = BRANCH_SLOTS
+    node_type = NODE_TYPE_BRANCH
+
+    def __init__(self, items):
+        (self._0, self._1, self._2, self._3, self._4, self._5, self._6,
+         self._7, self._8, self._9, self._a, self._b, self._c, self._d,
+         self._e, self._f, self.value) = items
+        self._hash = None
+
+    @classmethod
+    def blank(cls):
+        return cls([b''] * 17)
+
+    def items(self):
+        return _branch_items(self)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.items()[index])
+        return getattr(self, BRANCH_SLOTS[index])
+
+    def __setitem__(self, index, item):
+        setattr(self, BRANCH_SLOTS[index], item)
+        self._hash = None
+
+    def __len__(self):
+        return 17
+
+
+class KeyValueNode(TrieNode):
+    """[packed path, value or reference to the child node]
+    `key` is the packed path, which `path` reads without copying it.
+    """
+    __slots__ = ('key', 'value')
+    has_terminator = None
+
+    def __init__(self, items):
+        self.key, self.value = items
+        self._hash = None
+
+    @classmethod
+    def from_path(cls, path, item):
+        """
+        :param path: `NibblePath` or sequence of nibbles without terminator
+        """
+        return cls((NibblePath.from_nibbles(path).to_packed(
+            cls.has_terminator), item))
+
+    def items(self):
+        return _key_value_items(self)
+
+    @property
+    def path(self):
+        """`NibblePath` of the node, without terminator"""
+        return NibblePath(self.key, 1 if self.key[0] & 16 else 2)
+
+    def __getitem__(self, index):
+        if index == 1:
+            return self.value
+        return self.items()[index]
+
+    def __setitem__(self, index, item):
+        if index in (0, -2):
+            self.key = item
+        elif index in (1, -1):
+            self.value = item
+        else:
+            raise IndexError('KeyValueNode index out of range')
+        self._hash = None
+
+    def __len__(self):
+        return 2
+
+
+class LeafNode(KeyValueNode):
+    __slots__ = ()
+    node_type = NODE_TYPE_LEAF
+    has_terminator = True
+
+
+class ExtensionNode(KeyValueNode):
+    __slots__ = ()
+    node_type = NODE_TYPE_EXTENSION
+    has_terminator = False
+
+
+def to_node(item):
+    """convert a decoded node, in form of list, and its embedded children to
+    node classes. Nodes which are already converted are returned as is.
+    """
+    if isinstance(item, TrieNode):
+        return item
+
+    if len(item) == 17:
+        return BranchNode([to_node(x) if isinstance(x, list) else x
+                           for x in item])
+
+    key, child = item
+    if key[0] & 32:
+        return LeafNode((key, child))
+    return ExtensionNode((key, to_node(child)
+                          if isinstance(child, list) else child))
+
+
+def to_list(item):
+    """convert nodes, and lists holding nodes, to the nested lists they are
+    serialized as
+    """
+    if isinstance(item, TrieNode):
+        return item.to_list()
+    if isinstance(item, list):
+        return [to_list(x) for x in item]
+    return item
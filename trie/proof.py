@@ -0,0 +1,235 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from serializer.rlp import RLPSerializer
+from serializer.serializer import sha3_hash
+from trie.builder import TrieBuilder
+from trie.commit import commit_node
+from trie.constants import BLANK_NODE
+from trie.nibble_path import NibblePath
+from trie.nodes import TrieNode, BranchNode, LeafNode, to_node
+from trie.utils import str_to_bytes, range_position
+
+# `found` is True if the key is in the trie with `value`, False if the proof
+# shows that the key is not in the trie and None if the proof lacks a node on
+# the path of the key or has a malformed one, `error` telling which
+ProofResult = namedtuple('ProofResult', ['key', 'found', 'value', 'error'])
+
+
+class ProofVerifier:
+    """Look keys up from a root hash using only the nodes of a proof, without
+    building a trie. Each proof node is hashed once, when the verifier is
+    created, and decoded at most once, when a lookup reaches it, so a verifier
+    checks any number of keys proven by the same nodes. Proof nodes are
+    untrusted: a malformed node fails the lookups reaching it but never
+    raises.
+    """
+
+    def __init__(self, root_hash, proof_nodes, node_serializer=RLPSerializer):
+        """
+        :param proof_nodes: the nodes of the proof, root node included, as
+        returned with a proof or encoded
+        """
+        self.root_hash = root_hash
+        self.node_serializer = node_serializer
+        self._blank_root = sha3_hash(node_serializer.serialize_node(BLANK_NODE))
+        # Encoded and decoded nodes by hash, converted on first use into
+        # `_nodes`
+        self._encoded = {}
+        self._decoded = {}
+        self._nodes = {}
+        for node in proof_nodes:
+            if isinstance(node, bytes):
+                self._encoded[sha3_hash(node)] = node
+                continue
+            try:
+                encoded = node_serializer.serialize_node(node)
+            except Exception:
+                # Nothing can reference a node which can not be encoded
+                continue
+            self._decoded[sha3_hash(encoded)] = node
+
+    def lookup(self, key):
+        """
+        :return: `ProofResult` of `key`
+        """
+        key = str_to_bytes(key)
+        try:
+            return self._lookup(key)
+        except Exception as e:
+            return ProofResult(key, None, None,
+                               'Malformed proof node: {!r}'.format(e))
+
+    def _lookup(self, key):
+        if self.root_hash == self._blank_root:
+            return ProofResult(key, False, None, None)
+
+        nibbles = NibblePath(key)
+        depth = 0
+        ref = self.root_hash
+        while True:
+            if isinstance(ref, TrieNode):
+                # Embedded in its parent
+                node = ref
+            else:
+                node = self._get_node(ref)
+                if node is None:
+                    return ProofResult(key, None, None,
+                                       'Missing node {}'.format(ref.hex()))
+
+            if isinstance(node, BranchNode):
+                if depth == len(nibbles):
+                    if node[16] == BLANK_NODE:
+                        return ProofResult(key, False, None, None)
+                    return ProofResult(key, True, node[16], None)
+                ref = node[nibbles[depth]]
+                if ref == BLANK_NODE:
+                    return ProofResult(key, False, None, None)
+                depth += 1
+            else:
+                rest = nibbles[depth:]
+                if isinstance(node, LeafNode):
+                    if rest == node.path:
+                        return ProofResult(key, True, node[1], None)
+                    return ProofResult(key, False, None, None)
+                if not rest.startswith(node.path):
+                    return ProofResult(key, False, None, None)
+                ref = node[1]
+                depth += len(node.path)
+
+    def lookup_many(self, keys):
+        return [self.lookup(key) for key in keys]
+
+    def verify_existence(self, key, value):
+        result = self.lookup(key)
+        return result.found is True and result.value == value
+
+    def verify_existence_multi_keys(self, key_values):
+        return all(self.verify_existence(key, value)
+                   for key, value in key_values.items())
+
+    def verify_absence(self, key):
+        return self.lookup(key).found is False
+
+    def verify_range(self, start_key, end_key, key_values):
+        """check that `key_values` holds all the keys of the trie from
+        `start_key` to `end_key`, with their values, given the nodes of the
+        proof returned by `Trie.get_range`
+        """
+        lo = NibblePath(str_to_bytes(start_key))
+        hi = NibblePath(str_to_bytes(end_key))
+        items = sorted((NibblePath(str_to_bytes(k)), v)
+                       for k, v in dict(key_values).items())
+        if any(not lo <= k <= hi for k, _ in items):
+            return False
+        ref = BLANK_NODE if self.root_hash == self._blank_root \
+            else self.root_hash
+        try:
+            return self._verify_range(ref, NibblePath(), items, lo, hi)
+        except Exception:
+            # A malformed proof node
+            return False
+
+    def _verify_range(self, ref, path, items, lo, hi):
+        """check that `items`, the (nibbles, value) pairs in the range from
+        `lo` to `hi` with keys starting with `path`, are all the pairs of the
+        range in the referenced subtree
+        """
+        position = range_position(path, lo, hi)
+        if position in (-1, 1):
+            return not items
+        if position == 0:
+            builder = TrieBuilder(node_serializer=self.node_serializer)
+            for key, value in items:
+                builder.add_nibbles(key[len(path):], value)
+            node = builder.finish()
+            if node == BLANK_NODE:
+                return ref == BLANK_NODE
+            return commit_node(node, [], self.node_serializer) == ref
+
+        if ref == BLANK_NODE:
+            return not items
+        node = ref if isinstance(ref, TrieNode) else self._get_node(ref)
+        if node is None:
+            # Not part of the proof
+            return False
+
+        if not isinstance(node, BranchNode):
+            path = path + node.path
+            if isinstance(node, LeafNode):
+                if lo <= path <= hi:
+                    return items == [(path, node[1])]
+                return not items
+            if any(key[:len(path)] != path for key, _ in items):
+                return False
+            return self._verify_range(node[1], path, items, lo, hi)
+
+        depth = len(path)
+        children = {}
+        value_items = []
+        for key, value in items:
+            if len(key) == depth:
+                value_items.append((key, value))
+            else:
+                children.setdefault(key[depth], []).append((key, value))
+        expected = [(path, node[16])] \
+            if node[16] != BLANK_NODE and lo <= path <= hi else []
+        if value_items != expected:
+            return False
+        for i in range(16):
+            if node[i] == BLANK_NODE:
+                if i in children:
+                    return False
+            elif not self._verify_range(node[i], path + (i,),
+                                        children.get(i, []), lo, hi):
+                return False
+        return True
+
+    def _get_node(self, hashkey):
+        """
+        :return: the decoded node or None if it is not part of the proof
+        """
+        node = self._nodes.get(hashkey)
+        if node is None:
+            if hashkey in self._decoded:
+                node = to_node(self._decoded[hashkey])
+            elif hashkey in self._encoded:
+                node = to_node(self.node_serializer.deserialize_to_node(
+                    self._encoded[hashkey]))
+            else:
+                return None
+            self._nodes[hashkey] = node
+        return node
+
+
+def verify_proof(proof):
+    """
+    :param proof: (root hash, key, value, proof nodes) to verify that `key`
+    is in the trie with `value` or, if `value` is None, that it is absent
+    :return: whether the proof holds, False for a malformed proof
+    """
+    try:
+        root_hash, key, value, proof_nodes = proof
+        verifier = ProofVerifier(root_hash, proof_nodes)
+        if value is None:
+            return verifier.verify_absence(key)
+        return verifier.verify_existence(key, value)
+    except Exception:
+        # A bad proof must not lose the results of the others in a batch
+        return False
+
+
+def verify_proofs_parallel(proofs, max_workers=None, chunksize=64,
+                           executor=None):
+    """verify independent proofs in a pool of processes
+    :param proofs: iterable of proofs as taken by `verify_proof`. Encoded
+    proof nodes are cheaper to send to the processes than nodes.
+    :param chunksize: number of proofs sent to a process at once
+    :param executor: `concurrent.futures` executor to use instead of a new
+    process pool of `max_workers`, it is not shut down
+    :return: list of the results of `verify_proof`, in the order of `proofs`
+    """
+    if executor is not None:
+        return list(executor.map(verify_proof, proofs, chunksize=chunksize))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(verify_proof, proofs, chunksize=chunksize))
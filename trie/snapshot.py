@@ -0,0 +1,66 @@
+from trie.constants import BLANK_NODE
+
+
+class TrieSnapshot:
+    """Read-only view of a trie at a committed root, created by `Trie.at`.
+    It shares the db, node cache and serializer of the trie and only holds
+    its root node, decoded on first use, so views of many roots are cheap.
+    The views can be read from several threads while the trie is updated,
+    provided the db supports concurrent reads. Roots pruned from the db can
+    not be read.
+    """
+
+    def __init__(self, trie, root_hash, root_node=None):
+        """
+        :param root_node: decoded root node, if already known
+        """
+        self.trie = trie
+        self.root_hash = root_hash
+        self._root_node = root_node
+
+    @property
+    def root_node(self):
+        if self._root_node is None:
+            if self.root_hash == self.trie.BLANK_ROOT:
+                self._root_node = BLANK_NODE
+            else:
+                self._root_node = self.trie._decode_to_node(self.root_hash)
+        return self._root_node
+
+    def get(self, key, with_proof=False):
+        return self.trie.get(key, root_node=self.root_node,
+                             with_proof=with_proof)
+
+    def get_multi(self, keys, with_proof=False):
+        return self.trie.get_multi(keys, root_node=self.root_node,
+                                   with_proof=with_proof)
+
+    def get_keys_with_prefix(self, key_prefix, get_value=True,
+                             with_proof=False):
+        return self.trie.get_keys_with_prefix(key_prefix,
+                                              root_node=self.root_node,
+                                              get_value=get_value,
+                                              with_proof=with_proof)
+
+    def iter_prefix(self, key_prefix, start_after=None, limit=None,
+                    with_proof=False):
+        return self.trie.iter_prefix(key_prefix, start_after=start_after,
+                                     limit=limit, with_proof=with_proof,
+                                     root_node=self.root_node)
+
+    def get_range(self, start_key, end_key, with_proof=False):
+        return self.trie.get_range(start_key, end_key,
+                                   root_node=self.root_node,
+                                   with_proof=with_proof)
+
+    def items(self):
+        return self.trie.items(self.root_node)
+
+    def keys(self):
+        return self.trie.keys(self.root_node)
+
+    def values(self):
+        return self.trie.values(self.root_node)
+
+    def to_dict(self):
+        return dict(self.items())
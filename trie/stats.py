@@ -0,0 +1,107 @@
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+# Upper bounds in seconds of the buckets of the timing histograms, the last
+# bucket counts the longer durations
+TIMING_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+
+
+class Histogram:
+    """Distribution of the durations of an operation"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(TIMING_BUCKETS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(TIMING_BUCKETS, seconds)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {'count': self.count, 'total': self.total, 'mean': self.mean,
+                'max': self.max, 'buckets': list(self.buckets)}
+
+
+class TrieStats:
+    """Counters, like the number of nodes read or bytes written, and timing
+    histograms of the operations of the tries and dbs it is given to. Not
+    thread safe, use one per thread or lock around the operations.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self.timings = {}
+        self._scopes = []
+
+    def incr(self, name, amount=1):
+        self.counters[name] += amount
+        for scope in self._scopes:
+            scope.incr(name, amount)
+
+    def observe(self, name, seconds):
+        histogram = self.timings.get(name)
+        if histogram is None:
+            histogram = self.timings[name] = Histogram()
+        histogram.observe(seconds)
+        for scope in self._scopes:
+            scope.observe(name, seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start)
+
+    @contextmanager
+    def scope(self):
+        """collect, in a new `TrieStats`, what is recorded in the block as
+        well, like the cost of one block of updates
+        """
+        stats = TrieStats()
+        self._scopes.append(stats)
+        try:
+            yield stats
+        finally:
+            self._scopes.remove(stats)
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+
+    def to_dict(self):
+        return {'counters': dict(self.counters),
+                'timings': {name: histogram.to_dict()
+                            for name, histogram in self.timings.items()}}
+
+
+def timed(name):
+    """decorator recording the duration of a method in the `stats` of its
+    object, if it has some
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            stats = self.stats
+            if stats is None:
+                return method(self, *args, **kwargs)
+            start = perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                stats.observe(name, perf_counter() - start)
+        return wrapper
+    return decorator
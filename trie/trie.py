@@ -1,27 +1,93 @@
-from copy import deepcopy
+from contextlib import contextmanager
+from functools import wraps
+from itertools import islice
+from threading import RLock
 
 from serializer.rlp import RLPSerializer
-from serializer.serializer import sha3_hash
 from storage.ephem_db import EphemDB
+from trie.builder import TrieBuilder
+from trie.commit import commit_children, commit_children_parallel
+from trie.exceptions import KeyNotFoundError
+from trie.nibble_path import NibblePath
+from trie.nodes import TrieNode, BranchNode, KeyValueNode, LeafNode, \
+    ExtensionNode, EMBEDDED, to_node
+from trie.proof import ProofVerifier
+from trie.snapshot import TrieSnapshot
+from trie.stats import timed
 from trie.constants import BLANK_NODE, NODE_TYPE_BLANK, NODE_TYPE_LEAF, \
     NODE_TYPE_EXTENSION, NODE_TYPE_BRANCH, NIBBLE_TERMINATOR
-from trie.utils import without_terminator, unpack_to_nibbles, str_to_bytes, \
-    bin_to_nibbles, is_bytes, nibbles_to_bin, nibble_to_bytes, pack_nibbles, \
-    with_terminator, starts_with, without_terminator_and_flags
+from trie.utils import without_terminator, str_to_bytes, is_bytes, \
+    nibbles_to_bin, nibble_to_bytes, pack_nibbles, with_terminator, \
+    without_terminator_and_flags, range_position
+
+
+def writer(method):
+    """run the method holding the write lock of the trie"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class Trie:
-    def __init__(self, db, root_hash=None, node_serializer=RLPSerializer):
+    def __init__(self, db, root_hash=None, node_serializer=RLPSerializer,
+                 prune=False, node_cache=None, commit_executor=None,
+                 stats=None):
         """it also present a dictionary like interface
         :param db key value database
         :root: blank or trie node in form of [key, value] or [v0,v1..v15,v]
+        :param prune: delete nodes which are no longer referenced from the db
+        on commit. The db has to count references to its keys, like
+        `RefcountDB`, since identical subtrees are stored once. Nodes of
+        previous roots are deleted as well, so older roots can not be read
+        anymore.
+        :param node_cache: `NodeCache` of decoded nodes consulted before the
+        db, it can be shared by tries over the same db
+        :param commit_executor: `concurrent.futures` executor committing the
+        modified subtrees below the topmost branch in parallel, their nodes
+        are not put in `node_cache`. With a process pool the subtrees are
+        sent to the workers, which only pays off for large commits.
+        :param stats: `TrieStats` recording the nodes read and written and
+        the duration of the operations, nothing is recorded if None
         """
         self.db = db  # Pass in a database object directly
         self.node_serializer = node_serializer
-        self.BLANK_ROOT = self.node_serializer.hash_node(BLANK_NODE)
+        self.node_cache = node_cache
+        self.commit_executor = commit_executor
+        self.stats = stats
+        self._write_lock = RLock()
+        self.BLANK_ROOT = self.node_serializer.hash_node(BLANK_NODE)[0]
+        self.prune = prune
         self.set_root_hash(root_hash)
 
         self.deletes = []
+        self._in_batch = False
+
+    @classmethod
+    def from_sorted_items(cls, db, items, node_serializer=RLPSerializer,
+                          prune=False, node_cache=None, stats=None):
+        """build a trie in one pass from (key, value) pairs sorted by key,
+        each node is hashed and stored only once
+        :param items: iterable of (key, value) pairs in strictly increasing
+        order of keys
+        :param prune, node_cache, stats: see `__init__`, they apply to the
+        returned trie. `stats` also records the nodes written and the
+        duration of the build.
+        """
+        trie = cls(db, node_serializer=node_serializer, prune=prune,
+                   node_cache=node_cache, stats=stats)
+        trie._build(items)
+        return trie
+
+    @timed('from_sorted_items')
+    def _build(self, items):
+        builder = TrieBuilder(self.db, node_serializer=self.node_serializer,
+                              stats=self.stats)
+        for key, value in items:
+            builder.add(key, self.value_to_bytes(value))
+        self.root_node = builder.finish()
+        self._update_root_hash()
 
     @property
     def root_hash(self):
@@ -33,26 +99,72 @@ class Trie:
         return self._root_hash
 
     def _update_root_hash(self):
-        key, val = self.node_serializer.hash_node(self.root_node)
-        self.db.put(key, val)
+        if self.root_node is self._committed_root_node:
+            return
+        if self.root_node == BLANK_NODE:
+            key = self.BLANK_ROOT
+        else:
+            writes = []
+            self._commit_children(self.root_node, writes)
+            key, val = self.node_serializer.hash_node(self.root_node)
+            if self.stats is not None:
+                self.stats.incr('hashes')
+            self._set_encoding(self.root_node, key, val)
+            writes.append((key, val))
+            self._write_nodes(writes)
+            if self.node_cache is not None:
+                self.node_cache.put(key, self.root_node)
+        if self._root_hash != self.BLANK_ROOT:
+            self._delete_node_storage(self._root_hash)
         self._root_hash = key
+        self._publish()
 
     @root_hash.setter
     def root_hash(self, value):
         self.set_root_hash(value)
 
+    @writer
     def set_root_hash(self, root_hash=None):
-        if root_hash is None:
+        if root_hash is None or root_hash == self.BLANK_ROOT:
             self.root_node = BLANK_NODE
             self._root_hash = self.BLANK_ROOT
-            return
-        assert is_bytes(root_hash)
-        assert len(root_hash) in [0, 32]
-        self.root_node = self._decode_to_node(root_hash)
-        self._root_hash = root_hash
+        else:
+            assert is_bytes(root_hash)
+            assert len(root_hash) in [0, 32]
+            self.root_node = self._decode_to_node(root_hash)
+            self._root_hash = root_hash
+        self._publish()
+
+    def _publish(self):
+        """make the current root, whose nodes are in the db, the one read by
+        `snapshot`, with a single assignment so that readers see either the
+        previous root or this one
+        """
+        self._committed_root_node = self.root_node
+        self._latest = TrieSnapshot(self, self._root_hash, self.root_node)
 
+    def snapshot(self):
+        """
+        :return: read-only `TrieSnapshot` of the last committed root, which
+        other threads can read while this trie is updated
+        """
+        return self._latest
+
+    def at(self, root_hash):
+        """
+        :return: read-only `TrieSnapshot` of the trie at `root_hash`, a root
+        committed to the db
+        """
+        return TrieSnapshot(self, root_hash)
+
+    @timed('get')
     def get(self, key, root_node=None, with_proof=False):
-        root_node = root_node or self.root_node
+        """
+        :raises KeyNotFoundError: if `key` is not in the trie, with the proof
+        of its absence if `with_proof` is True
+        """
+        if root_node is None:
+            root_node = self.root_node
         proof_nodes = [] if with_proof else None
         val = self._get(root_node, self.key_to_nibbles(key), proof_nodes=proof_nodes)
         if with_proof:
@@ -60,9 +172,33 @@ class Trie:
         else:
             return val
 
+    @timed('get_multi')
+    def get_multi(self, keys, root_node=None, with_proof=False):
+        """get the values of many keys in a single traversal, the nodes
+        shared by their paths are visited once
+        :return: dict of the values of the keys in the trie, the missing keys
+        are left out. If `with_proof` is True, also a dict of the proof nodes
+        by hash, proving the values as well as the absence of the missing
+        keys. Like for `get`, the root node is not part of the proof.
+        """
+        if root_node is None:
+            root_node = self.root_node
+        proof_nodes = {} if with_proof else None
+        keys = sorted(set(str_to_bytes(key) for key in keys))
+        values = {}
+        self._get_multi(root_node, [(self.key_to_nibbles(key), key)
+                                    for key in keys],
+                        0, values, proof_nodes)
+        if with_proof:
+            return values, proof_nodes
+        else:
+            return values
+
+    @timed('get_keys_with_prefix')
     def get_keys_with_prefix(self, key_prefix, root_node=None, get_value=True,
                              with_proof=False):
-        root_node = root_node or self.root_node
+        if root_node is None:
+            root_node = self.root_node
         proof_nodes = [] if with_proof else None
         seen_prefix = []
         prefix_node = self._get_last_node_for_prfx(root_node,
@@ -70,22 +206,75 @@ class Trie:
                                                    seen_prfx=seen_prefix,
                                                    proof_nodes=proof_nodes)
 
-        rv = self._to_dict(prefix_node, proof_nodes=proof_nodes)
-        # If values are needed then convert the keys appropriately
         if get_value:
-            new_rv = {}
-            for k, v in rv.items():
-                # Add the seen prefix to each key
-                k_ = seen_prefix + [int(x) for x in k.split(b'+')]
-                new_rv[nibbles_to_bin(without_terminator_and_flags(k_))] = v
-
-            rv = new_rv
+            rv = dict(self._iter_items(prefix_node,
+                                       NibblePath.from_nibbles(seen_prefix),
+                                       proof_nodes=proof_nodes))
+        else:
+            rv = self._to_dict(prefix_node, proof_nodes=proof_nodes)
 
         if with_proof:
             return rv, proof_nodes
         else:
             return rv
 
+    def iter_prefix(self, key_prefix, start_after=None, limit=None,
+                    with_proof=False, root_node=None):
+        """iterate lazily over the (key, value) pairs whose key starts with
+        `key_prefix`, in increasing order of keys
+        :param start_after: only keys greater than this one are returned, the
+        last key of a page is the cursor for the next page
+        :param limit: maximum number of pairs to return
+        :param with_proof: if True, return the list of pairs and the proof
+        nodes on their paths instead of an iterator. Like for `get`, the root
+        node is not part of the proof.
+        """
+        if root_node is None:
+            root_node = self.root_node
+        proof_nodes = [] if with_proof else None
+        seen_prefix = []
+        prefix_node = self._get_last_node_for_prfx(root_node,
+                                                   self.key_to_nibbles(key_prefix),
+                                                   seen_prfx=seen_prefix,
+                                                   proof_nodes=proof_nodes)
+        if start_after is not None:
+            start_after = self.key_to_nibbles(start_after)
+
+        items = self._iter_items(prefix_node,
+                                 NibblePath.from_nibbles(seen_prefix),
+                                 start_after=start_after,
+                                 proof_nodes=proof_nodes)
+        if limit is not None:
+            items = islice(items, limit)
+
+        if with_proof:
+            return list(items), proof_nodes
+        else:
+            return items
+
+    @timed('get_range')
+    def get_range(self, start_key, end_key, root_node=None, with_proof=False):
+        """get the (key, value) pairs with `start_key` <= key <= `end_key`, in
+        increasing order of keys
+        :param with_proof: if True, also return the proof of the range: the
+        nodes on the paths to the two boundary keys. Subtrees entirely within
+        the range are left out as the verifier rebuilds them from the pairs.
+        Like for `get`, the root node is not part of the proof.
+        """
+        if root_node is None:
+            root_node = self.root_node
+        proof_nodes = [] if with_proof else None
+        items = list(self._iter_range(root_node,
+                                      self.key_to_nibbles(start_key),
+                                      self.key_to_nibbles(end_key),
+                                      proof_nodes=proof_nodes))
+        if with_proof:
+            return items, proof_nodes
+        else:
+            return items
+
+    @timed('update')
+    @writer
     def update(self, key, value):
         """
         :param key: a string
@@ -104,52 +293,111 @@ class Trie:
             self.key_to_nibbles(key),
             self.value_to_bytes(value))
 
+        if not self._in_batch:
+            self._update_root_hash()
+
+    @timed('update_many')
+    def update_many(self, items):
+        """update all (key, value) pairs of `items` in a single batch
+        :param items: iterable of (key, value) pairs or a dict
+        """
+        if isinstance(items, dict):
+            items = items.items()
+        with self.batch():
+            for key, value in items:
+                self.update(key, value)
+
+    @contextmanager
+    def batch(self):
+        """group several updates so that modified nodes are kept in memory
+        and only hashed and written to the db once, when the batch ends.
+        `root_hash` is not refreshed until then. If the batch raises, the trie
+        is rolled back to the root it had before the batch.
+        Nested batches are merged into the outermost one.
+        """
+        with self._write_lock:
+            if self._in_batch:
+                yield self
+                return
+
+            root_node, root_hash = self.root_node, self._root_hash
+            deletes_count = len(self.deletes)
+            self._in_batch = True
+            try:
+                yield self
+            except BaseException:
+                self.root_node, self._root_hash = root_node, root_hash
+                del self.deletes[deletes_count:]
+                raise
+            finally:
+                self._in_batch = False
+            self.commit()
+
+    @timed('commit')
+    @writer
+    def commit(self):
+        """hash and persist all modified nodes, delete the nodes which are no
+        longer referenced if pruning, then commit the db
+        """
         self._update_root_hash()
+        if self.prune:
+            # Deletes come after the puts of the same commit so that a node
+            # replaced by an identical one is not removed from the db
+            for hashkey in self.deletes:
+                self.db.delete(hashkey)
+        self.deletes = []
+        self.db.commit()
 
+    @timed('delete')
+    @writer
     def delete(self, key):
         """
-        :param key: a string with length of [0, 32]
+        :param key: a string, deleting a key which is not present does nothing
         """
         if not is_bytes(key):
             raise Exception("Key must be string")
 
-        if len(key) > 32:
-            raise Exception("Max key length is 32")
-
         self.root_node = self._delete_and_delete_storage(
             self.root_node, self.key_to_nibbles(key))
 
-        self._update_root_hash()
+        if not self._in_batch:
+            self._update_root_hash()
 
+    @timed('clear')
+    @writer
     def clear(self):
         """ clear all tree data
         """
         self._delete_child_storage(self.root_node)
-        self._delete_node_storage(self.root_node)
+        if self._root_hash != self.BLANK_ROOT:
+            self._delete_node_storage(self._root_hash)
         self.root_node = BLANK_NODE
         self._root_hash = self.BLANK_ROOT
+        self._publish()
 
     def _get(self, node, key, proof_nodes=None):
         """ get value inside a node
         :param node: node in form of list, or BLANK_NODE
         :param key: nibble list without terminator
         :return:
-            KeyError if does not exist, otherwise value
+            KeyNotFoundError if does not exist, otherwise value
         """
         node_type = self._get_node_type(node)
 
         if node_type == NODE_TYPE_BLANK:
-            return BLANK_NODE
+            raise KeyNotFoundError(proof_nodes=proof_nodes)
 
         if node_type == NODE_TYPE_BRANCH:
             # already reach the expected node
             if not key:
+                if node[-1] == BLANK_NODE:
+                    raise KeyNotFoundError(proof_nodes=proof_nodes)
                 return node[-1]
-            sub_node = self._decode_to_node(node[key[0]])
-            if sub_node == BLANK_NODE and key:
-                # TODO: Add proof to exception
-                raise KeyError
-            self._update_proof_nodes(node[key[0]], sub_node, proof_nodes=proof_nodes)
+            ref = node[key[0]]
+            if ref == BLANK_NODE:
+                raise KeyNotFoundError(proof_nodes=proof_nodes)
+            sub_node = self._decode_to_node(ref)
+            self._update_proof_nodes(ref, sub_node, proof_nodes=proof_nodes)
             return self._get(sub_node, key[1:], proof_nodes)
 
         # key value node
@@ -158,31 +406,77 @@ class Trie:
             if key == curr_key:
                 return node[1]
             else:
-                # TODO: Add proof to exception
-                raise KeyError
+                raise KeyNotFoundError(proof_nodes=proof_nodes)
 
         if node_type == NODE_TYPE_EXTENSION:
             # traverse child nodes
-            if starts_with(key, curr_key):
+            if key.startswith(curr_key):
                 sub_node = self._get_inner_node_from_extension(node)
                 if sub_node == BLANK_NODE and key[len(curr_key):]:
-                    # TODO: Add proof to exception
-                    raise KeyError
+                    raise KeyNotFoundError(proof_nodes=proof_nodes)
                 self._update_proof_nodes(node[1], sub_node,
                                          proof_nodes=proof_nodes)
                 return self._get(sub_node, key[len(curr_key):], proof_nodes)
             else:
-                # TODO: Add proof to exception
-                raise KeyError
+                raise KeyNotFoundError(proof_nodes=proof_nodes)
+
+    def _get_multi(self, node, keys, depth, values, proof_nodes=None):
+        """
+        :param keys: sorted list of (nibbles, key) of the keys whose first
+        `depth` nibbles lead to `node`
+        :param values: dict updated with the value of each key found
+        :param proof_nodes: dict of the hashed nodes visited by hash
+        """
+        node_type = self._get_node_type(node)
+
+        if node_type == NODE_TYPE_BRANCH:
+            children = {}
+            for nibbles, key in keys:
+                if len(nibbles) == depth:
+                    if node[16] != BLANK_NODE:
+                        values[key] = node[16]
+                else:
+                    children.setdefault(nibbles[depth], []).append(
+                        (nibbles, key))
+            for index, sub_keys in children.items():
+                if node[index] != BLANK_NODE:
+                    sub_node = self._get_proof_node(node[index], proof_nodes)
+                    self._get_multi(sub_node, sub_keys, depth + 1, values,
+                                    proof_nodes)
+
+        elif self.is_key_value_type(node_type):
+            curr_key = self.key_nibbles_from_key_value_node(node)
+            if node_type == NODE_TYPE_LEAF:
+                for nibbles, key in keys:
+                    if nibbles[depth:] == curr_key:
+                        values[key] = node[1]
+            else:
+                sub_keys = [(nibbles, key) for nibbles, key in keys
+                            if nibbles[depth:].startswith(curr_key)]
+                if sub_keys:
+                    sub_node = self._get_proof_node(node[1], proof_nodes)
+                    self._get_multi(sub_node, sub_keys,
+                                    depth + len(curr_key), values,
+                                    proof_nodes)
+
+    def _get_proof_node(self, ref, proof_nodes=None):
+        """decode the referenced node and add it to the dict `proof_nodes`
+        if it is hashed
+        """
+        node = self._decode_to_node(ref)
+        if proof_nodes is not None and not isinstance(ref, TrieNode):
+            proof_nodes[ref] = node
+        return node
 
     def _get_last_node_for_prfx(self, node, key_prfx, seen_prfx, proof_nodes=None):
         """ get last node for the given prefix, also update `seen_prfx` to track the path already traversed
         :param node: node in form of list, or BLANK_NODE
-        :param key_prfx: prefix to look for
+        :param key_prfx: prefix to look for, `NibblePath` or list of nibbles
         :param seen_prfx: prefix already seen, updates with each call
         :return:
             KeyError if does not exist, otherwise node
         """
+        key_prfx = NibblePath.from_nibbles(key_prfx)
         node_type = self._get_node_type(node)
 
         if node_type == NODE_TYPE_BLANK:
@@ -204,7 +498,7 @@ class Trie:
 
         if node_type == NODE_TYPE_LEAF:
             # Return this node only if the complete prefix is part of the current key
-            if starts_with(curr_key, key_prfx):
+            if curr_key.startswith(key_prfx):
                 # Do not update `seen_prefix` as node has the prefix
                 return node
             else:
@@ -213,7 +507,7 @@ class Trie:
         if node_type == NODE_TYPE_EXTENSION:
             # traverse child nodes
             if len(key_prfx) > len(curr_key):
-                if starts_with(key_prfx, curr_key):
+                if key_prfx.startswith(curr_key):
                     sub_node = self._get_inner_node_from_extension(node)
                     seen_prfx.extend(curr_key)
                     self._update_proof_nodes(node[1], sub_node,
@@ -226,7 +520,7 @@ class Trie:
                 else:
                     return BLANK_NODE
             else:
-                if starts_with(curr_key, key_prfx):
+                if curr_key.startswith(key_prfx):
                     # Do not update `seen_prefix` as node has the prefix
                     return node
                 else:
@@ -246,26 +540,38 @@ class Trie:
         node_type = self._get_node_type(node)
 
         if node_type == NODE_TYPE_BLANK:
-            return [self.key_nibbles_to_bytes(key, add_terminator=True), value]
+            return LeafNode.from_path(key, value)
 
         elif node_type == NODE_TYPE_BRANCH:
+            # Nodes are never modified in place, a changed branch is a copy
             if not key:
-                node[-1] = value
+                if node[-1] == value:
+                    return node
+                new_node = BranchNode(node)
+                new_node[-1] = value
             else:
-                new_node = self._update_and_delete_storage(
-                    self._decode_to_node(node[key[0]]),
-                    key[1:], value)
-                node[key[0]] = self._encode_node(new_node)
-            return node
+                sub_node = self._update_and_delete_storage(
+                    node[key[0]], key[1:], value)
+                if sub_node is node[key[0]]:
+                    return node
+                new_node = BranchNode(node)
+                new_node[key[0]] = sub_node
+            return new_node
 
         elif self.is_key_value_type(node_type):
             return self._update_kv_node(node, key, value)
 
-    def _update_and_delete_storage(self, node, key, value):
-        old_node = node[:]
+    def _update_and_delete_storage(self, ref, key, value):
+        """update the node referenced by `ref`, the storage of the replaced
+        node is scheduled for deletion
+        :param ref: hash of a node or the node itself
+        :return: new node, or the referenced node if nothing changed
+        """
+        node = self._decode_to_node(ref)
         new_node = self._update(node, key, value)
-        if old_node != new_node:
-            self._delete_node_storage(old_node)
+        if new_node is node:
+            return ref
+        self._delete_node_storage(ref)
         return new_node
 
     def _update_kv_node(self, node, key, value):
@@ -274,33 +580,34 @@ class Trie:
         is_extension_node = node_type == NODE_TYPE_EXTENSION
 
         # find longest common prefix
-        prefix_length = 0
-        for i in range(min(len(curr_key), len(key))):
-            if key[i] != curr_key[i]:
-                break
-            prefix_length = i + 1
+        prefix_length = curr_key.common_prefix_length(key)
 
         remain_key = key[prefix_length:]
         remain_curr_key = curr_key[prefix_length:]
 
-        if remain_key == [] == remain_curr_key:
+        if not remain_key and not remain_curr_key:
             if not is_extension_node:
-                return [node[0], value]
-            new_node = self._update_and_delete_storage(
-                self._get_inner_node_from_extension(node), remain_key, value)
+                if node[1] == value:
+                    return node
+                return LeafNode.from_path(curr_key, value)
+            new_node = self._update_and_delete_storage(node[1], remain_key,
+                                                       value)
+            if new_node is node[1]:
+                return node
 
         elif not remain_curr_key:
             if is_extension_node:
-                new_node = self._update_and_delete_storage(
-                    self._get_inner_node_from_extension(node),
-                    remain_key, value)
+                new_node = self._update_and_delete_storage(node[1], remain_key,
+                                                           value)
+                if new_node is node[1]:
+                    return node
             else:
-                new_node = [BLANK_NODE] * 17
+                new_node = BranchNode.blank()
                 new_node[-1] = node[1]
                 new_node[remain_key[0]] = self._store_leaf_node(remain_key[1:],
                                                                 value)
         else:
-            new_node = [BLANK_NODE] * 17
+            new_node = BranchNode.blank()
             if len(remain_curr_key) == 1 and is_extension_node:
                 new_node[remain_curr_key[0]] = node[1]
             else:
@@ -318,11 +625,107 @@ class Trie:
 
         if prefix_length:
             # create node for key prefix
-            return [self.key_nibbles_to_bytes(curr_key[:prefix_length]),
-                    self._encode_node(new_node)]
+            return ExtensionNode.from_path(curr_key[:prefix_length], new_node)
         else:
             return new_node
 
+    def _delete(self, node, key):
+        """ delete item inside a node
+        :param node: node in form of list, or BLANK_NODE
+        :param key: nibble list without terminator
+            .. note:: key may be []
+        :return: new node, or `node` if the key is not present
+        """
+        node_type = self._get_node_type(node)
+
+        if node_type == NODE_TYPE_BLANK:
+            return node
+
+        if node_type == NODE_TYPE_BRANCH:
+            return self._delete_branch_node(node, key)
+
+        if self.is_key_value_type(node_type):
+            return self._delete_kv_node(node, key)
+
+    def _delete_and_delete_storage(self, ref, key):
+        """delete from the node referenced by `ref`, the storage of the
+        replaced node is scheduled for deletion
+        :param ref: hash of a node or the node itself
+        :return: new node, or the referenced node if nothing changed
+        """
+        node = self._decode_to_node(ref)
+        new_node = self._delete(node, key)
+        if new_node is node:
+            return ref
+        self._delete_node_storage(ref)
+        return new_node
+
+    def _delete_branch_node(self, node, key):
+        # already reach the expected node
+        if not key:
+            if node[-1] == BLANK_NODE:
+                return node
+            new_node = BranchNode(node)
+            new_node[-1] = BLANK_NODE
+            return self._normalize_branch_node(new_node)
+
+        sub_node = self._delete_and_delete_storage(node[key[0]], key[1:])
+        if sub_node is node[key[0]]:
+            return node
+
+        new_node = BranchNode(node)
+        new_node[key[0]] = sub_node
+        if sub_node == BLANK_NODE:
+            return self._normalize_branch_node(new_node)
+        return new_node
+
+    def _normalize_branch_node(self, node):
+        """a branch node left with a single item is replaced by a key value
+        node
+        """
+        not_blank_indices = [i for i, item in enumerate(node)
+                             if item != BLANK_NODE]
+        if len(not_blank_indices) > 1:
+            return node
+
+        index = not_blank_indices[0]
+        # only the value is left
+        if index == 16:
+            return LeafNode.from_path([], node[16])
+
+        sub_node = self._decode_to_node(node[index])
+        if isinstance(sub_node, KeyValueNode):
+            # collapse the sub node into this node, the new node keeps the
+            # type of the sub node
+            self._delete_node_storage(node[index])
+            return sub_node.from_path([index] + sub_node.path, sub_node[1])
+
+        return ExtensionNode.from_path([index], node[index])
+
+    def _delete_kv_node(self, node, key):
+        node_type = self._get_node_type(node)
+        curr_key = self.key_nibbles_from_key_value_node(node)
+
+        if not key.startswith(curr_key):
+            # key not found
+            return node
+
+        if node_type == NODE_TYPE_LEAF:
+            return BLANK_NODE if key == curr_key else node
+
+        new_sub_node = self._delete_and_delete_storage(node[1],
+                                                       key[len(curr_key):])
+        if new_sub_node is node[1]:
+            return node
+
+        if isinstance(new_sub_node, KeyValueNode):
+            # collapse the sub node into this node, the new node keeps the
+            # type of the sub node
+            return new_sub_node.from_path(curr_key + new_sub_node.path,
+                                          new_sub_node[1])
+
+        return ExtensionNode.from_path(curr_key, new_sub_node)
+
     def _to_dict(self, node, proof_nodes=None):
         """convert (key, value) stored in this and the descendant nodes
         to dict items.
@@ -373,80 +776,244 @@ class Trie:
             return res
 
     def to_dict(self):
-        d = self._to_dict(self.root_node)
-        res = {}
-        for key_str, value in d.items():
-            if key_str:
-                nibbles = [int(x) for x in key_str.split(b'+')]
-            else:
-                nibbles = []
-            key = nibbles_to_bin(without_terminator(nibbles))
-            res[key] = value
-        return res
+        return dict(self.items())
 
-    def _encode_node(self, node, put_in_db=True):
-        if node == BLANK_NODE:
-            return BLANK_NODE
+    def items(self, root_node=None):
+        """lazily iterate over the (key, value) pairs in increasing order of
+        keys, only the nodes on the path being visited are held in memory
+        """
+        if root_node is None:
+            root_node = self.root_node
+        return self._iter_items(root_node, NibblePath())
+
+    def keys(self, root_node=None):
+        return (key for key, _ in self.items(root_node))
+
+    def values(self, root_node=None):
+        return (value for _, value in self.items(root_node))
+
+    def _iter_items(self, ref, prefix, start_after=None, proof_nodes=None):
+        """depth first traversal yielding the (key, value) pairs stored in
+        and below the referenced node
+        :param ref: hash of a node or the node itself
+        :param prefix: `NibblePath` of the node
+        :param start_after: `NibblePath`, only greater keys are yielded and
+        the subtrees with smaller keys are not visited
+        """
+        # Children are pushed in reverse order and only decoded when popped,
+        # so at most 16 references are pending per level. `bounded` tells
+        # whether the path is a prefix of `start_after`.
+        stack = [(ref, prefix, start_after is not None)]
+        while stack:
+            ref, path, bounded = stack.pop()
+            if bounded:
+                head = start_after[:len(path)]
+                if path < head:
+                    continue
+                bounded = path == head
+
+            node = self._decode_to_node(ref)
+            self._update_proof_nodes(ref, node, proof_nodes=proof_nodes)
+            node_type = self._get_node_type(node)
+
+            if self.is_key_value_type(node_type):
+                path = path + self.key_nibbles_from_key_value_node(node)
+                if node_type == NODE_TYPE_EXTENSION:
+                    stack.append((node[1], path, bounded))
+                elif not bounded or path > start_after:
+                    yield path.to_bytes(), node[1]
+
+            elif node_type == NODE_TYPE_BRANCH:
+                for i in range(15, -1, -1):
+                    if node[i] != BLANK_NODE:
+                        stack.append((node[i], path + (i,), bounded))
+                # A key ending at the branch is smaller than the keys below it
+                if node[16] != BLANK_NODE and \
+                        (not bounded or path > start_after):
+                    yield path.to_bytes(), node[16]
+
+    def diff(self, old_root_hash, new_root_hash):
+        """lazily yield (key, old value, new value) for each key whose value
+        differs between two committed roots, in increasing order of keys.
+        The old value is None for an added key and the new value is None
+        for a removed key. Both tries are walked together and subtrees with
+        the same reference on both sides are skipped, so the cost is
+        proportional to the changes rather than to the size of the tries.
+        """
+        return self._diff(self._root_ref(old_root_hash),
+                          self._root_ref(new_root_hash), NibblePath())
+
+    def _root_ref(self, root_hash):
+        return BLANK_NODE if root_hash == self.BLANK_ROOT else root_hash
+
+    def _diff(self, old, new, path):
+        """
+        :param old: reference to the old subtree at `path`, a `NibblePath`
+        :param new: reference to the new subtree at `path`
+        """
+        if old == new:
+            return
+        if old == BLANK_NODE:
+            for key, value in self._iter_items(new, path):
+                yield key, None, value
+            return
+        if new == BLANK_NODE:
+            for key, value in self._iter_items(old, path):
+                yield key, value, None
+            return
+
+        old_value, old_children = self._virtual_branch(old)
+        new_value, new_children = self._virtual_branch(new)
+        if old_value != new_value:
+            yield path.to_bytes(), old_value or None, new_value or None
+        for i in range(16):
+            if old_children[i] != new_children[i]:
+                yield from self._diff(old_children[i], new_children[i],
+                                      path + (i,))
+
+    def _virtual_branch(self, ref):
+        """view the referenced node as a branch, key-value nodes having a
+        single child holding the rest of their path
+        :return: (value at the node, list of the references to the 16
+        children)
+        """
+        node = self._decode_to_node(ref)
+        node_type = self._get_node_type(node)
+        if node_type == NODE_TYPE_BRANCH:
+            return node[16], node[:16]
+
+        children = [BLANK_NODE] * 16
+        path = self.key_nibbles_from_key_value_node(node)
+        if node_type == NODE_TYPE_LEAF:
+            if not path:
+                return node[1], children
+            children[path[0]] = LeafNode.from_path(path[1:], node[1])
+        elif len(path) > 1:
+            children[path[0]] = ExtensionNode.from_path(path[1:], node[1])
+        else:
+            children[path[0]] = node[1]
+        return BLANK_NODE, children
 
-        encoded = self.node_serializer.serialize_node(node)
+    def _iter_range(self, ref, lo, hi, proof_nodes=None):
+        """depth first traversal yielding the (key, value) pairs with keys
+        from `lo` to `hi`, `NibblePath`s. Only the nodes on the paths to
+        the boundaries are added to `proof_nodes`.
+        """
+        stack = [(ref, NibblePath())]
+        while stack:
+            ref, path = stack.pop()
+            position = range_position(path, lo, hi)
+            if position == -1:
+                continue
+            if position == 1:
+                # The subtrees left on the stack are greater
+                return
+            if position == 0:
+                yield from self._iter_items(ref, path)
+                continue
+
+            node = self._decode_to_node(ref)
+            self._update_proof_nodes(ref, node, proof_nodes=proof_nodes)
+            node_type = self._get_node_type(node)
+
+            if self.is_key_value_type(node_type):
+                path = path + self.key_nibbles_from_key_value_node(node)
+                if node_type == NODE_TYPE_EXTENSION:
+                    stack.append((node[1], path))
+                elif lo <= path <= hi:
+                    yield path.to_bytes(), node[1]
+
+            elif node_type == NODE_TYPE_BRANCH:
+                for i in range(15, -1, -1):
+                    if node[i] != BLANK_NODE:
+                        stack.append((node[i], path + (i,)))
+                if node[16] != BLANK_NODE and lo <= path <= hi:
+                    yield path.to_bytes(), node[16]
+
+    def _commit_children(self, node, writes):
+        if self.commit_executor is not None:
+            commit_children_parallel(node, writes, self.commit_executor,
+                                     self.node_serializer, self.stats)
+        commit_children(node, writes, self.node_serializer, self.node_cache,
+                        self.stats)
+
+    @staticmethod
+    def _set_encoding(node, hashkey, encoded):
+        # The root is stored by its hash whatever its length, only long nodes
+        # are referenced by their hash from a parent
         if len(encoded) < 32:
-            return node
+            node._hash = EMBEDDED
+        else:
+            node._hash = hashkey
 
-        hashkey = sha3_hash(encoded)
-        if put_in_db:
+    def _write_nodes(self, writes):
+        for hashkey, encoded in writes:
             self.db.put(hashkey, encoded)
-        return hashkey
+        if self.stats is not None:
+            self.stats.incr('nodes_written', len(writes))
+            self.stats.incr('bytes_written',
+                            sum(len(encoded) for _, encoded in writes))
 
     def _decode_to_node(self, encoded):
         if encoded == BLANK_NODE:
             return BLANK_NODE
-        if isinstance(encoded, list):
-            return encoded
-        o = self.node_serializer.deserialize_to_node(self.db.get(encoded))
+        if isinstance(encoded, (list, TrieNode)):
+            return to_node(encoded)
+        if self.node_cache is not None:
+            o = self.node_cache.get(encoded)
+            if o is not None:
+                if self.stats is not None:
+                    self.stats.incr('cache_hits')
+                return o
+        serz = self.db.get(encoded)
+        if self.stats is not None:
+            self.stats.incr('nodes_read')
+            self.stats.incr('bytes_read', len(serz))
+        o = to_node(self.node_serializer.deserialize_to_node(serz))
+        self._set_encoding(o, encoded, serz)
+        if self.node_cache is not None:
+            self.node_cache.put(encoded, o)
         return o
 
     def _delete_child_storage(self, node):
         node_type = self._get_node_type(node)
         if node_type == NODE_TYPE_BRANCH:
             for item in node[:16]:
+                self._delete_node_storage(item)
                 self._delete_child_storage(self._decode_to_node(item))
         elif node_type == NODE_TYPE_EXTENSION:
+            self._delete_node_storage(node[1])
             self._delete_child_storage(self._get_inner_node_from_extension(
                 node))
 
-    def _delete_node_storage(self, node):
+    def _delete_node_storage(self, ref):
         """delete storage
-        :param node: node in form of list, or BLANK_NODE
+        :param ref: reference to the node, nodes that are not stored by their
+        hash (embedded in their parent or not committed yet) have no storage
         """
-        if node == BLANK_NODE:
-            return
-        # assert isinstance(node, list)
-        encoded = self._encode_node(node, put_in_db=False)
-        if len(encoded) < 32:
+        if not self.prune or isinstance(ref, TrieNode) or len(ref) < 32:
             return
-        """
-        ===== FIXME ====
-        in the current trie implementation two nodes can share identical subtrees
-        thus we can not safely delete nodes for now
-        """
-        self.deletes.append(encoded)
+        # Two nodes can share identical subtrees, the hash is only removed
+        # from the db by `commit` when pruning, which relies on reference
+        # counting
+        self.deletes.append(ref)
 
     def _get_inner_node_from_extension(self, node):
         return self._decode_to_node(node[1])
 
     def _store_leaf_node(self, key, value):
-        k = self.key_nibbles_to_bytes(key, add_terminator=True)
-        return self._encode_node([k, value])
+        # The node is hashed and stored when the trie is committed
+        return LeafNode.from_path(key, value)
 
     def _store_extension_node(self, key, value):
-        k = self.key_nibbles_to_bytes(key, remove_terminator=True)
-        return self._encode_node([k, value])
+        return ExtensionNode.from_path(key, value)
 
     @staticmethod
     def _update_proof_nodes(existing_node, new_node, proof_nodes=None):
         if isinstance(proof_nodes, list) and existing_node != BLANK_NODE and \
-                not isinstance(existing_node, list):
-            proof_nodes.append(deepcopy(new_node))
+                not isinstance(existing_node, TrieNode):
+            # Nodes are not modified once referenced, no need to copy them
+            proof_nodes.append(new_node)
 
     @staticmethod
     def verify_proof_of_existence(root, key, value, proof_nodes):
@@ -454,16 +1021,7 @@ class Trie:
         # NOTE: `root` is a derivative of the last element of `proof_nodes`
         # but it's important to keep `root` as a separate as signed root
         # hashes will be published.
-
-        new_trie = Trie.get_new_trie_with_proof_nodes(proof_nodes)
-
-        try:
-            new_trie.root_hash = root
-            v = new_trie.get(key)
-            return v == value
-        except Exception as e:
-            print(e)
-        return False
+        return ProofVerifier(root, proof_nodes).verify_existence(key, value)
 
     @staticmethod
     def verify_proof_of_existence_multi_keys(root, key_values, proof_nodes):
@@ -471,25 +1029,22 @@ class Trie:
         # NOTE: `root` is a derivative of the last element of `proof_nodes`
         # but it's important to keep `root` as a separate as signed root
         # hashes will be published.
+        return ProofVerifier(root, proof_nodes).verify_existence_multi_keys(
+            key_values)
 
-        new_trie = Trie.get_new_trie_with_proof_nodes(proof_nodes)
-
-        try:
-            new_trie.root_hash = root
-        except Exception as e:
-            print(e)
-            return False
-
-        for k, v in key_values.items():
-            try:
-                _v = new_trie.get(k)
-            except Exception as e:
-                print(e)
-                return False
-            if v != _v:
-                return False
+    @staticmethod
+    def verify_proof_of_absence(root, key, proof_nodes):
+        # Checks that `key` is not in the trie, `proof_nodes` being the ones
+        # of the `KeyNotFoundError` raised by `get` with the root node added
+        return ProofVerifier(root, proof_nodes).verify_absence(key)
 
-        return True
+    @staticmethod
+    def verify_range_proof(root, start_key, end_key, key_values, proof_nodes):
+        # Checks that `key_values` holds all the keys of the trie from
+        # `start_key` to `end_key`, with their values, given the proof
+        # returned by `get_range` to which the root node is added
+        return ProofVerifier(root, proof_nodes).verify_range(
+            start_key, end_key, key_values)
 
     @staticmethod
     def get_new_trie_with_proof_nodes(proof_nodes,
@@ -508,11 +1063,12 @@ class Trie:
         :param node: node in form of list, or BLANK_NODE
         :return: node type
         """
+        if isinstance(node, TrieNode):
+            return node.node_type
         if node == BLANK_NODE:
             return NODE_TYPE_BLANK
         if len(node) == 2:
-            nibbles = unpack_to_nibbles(node[0])
-            has_terminator = (nibbles and nibbles[-1] == NIBBLE_TERMINATOR)
+            _, has_terminator = NibblePath.from_packed(node[0])
             return NODE_TYPE_LEAF if has_terminator \
                 else NODE_TYPE_EXTENSION
         if len(node) == 17:
@@ -524,16 +1080,19 @@ class Trie:
 
     @staticmethod
     def key_nibbles_from_key_value_node(node):
-        return without_terminator(unpack_to_nibbles(node[0]))
+        if isinstance(node, KeyValueNode):
+            return node.path
+        return NibblePath.from_packed(node[0])[0]
 
     @staticmethod
     def key_to_nibbles(key):
-        return bin_to_nibbles(str_to_bytes(key))
+        return NibblePath(str_to_bytes(key))
 
     @staticmethod
     def key_nibbles_to_bytes(key, add_terminator=None, remove_terminator=None):
         if add_terminator and remove_terminator:
             raise ValueError('Both with_terminator and without_terminator cannot be true')
+        key = list(key)
         if add_terminator:
             return pack_nibbles(with_terminator(key))
         if remove_terminator:
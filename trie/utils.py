@@ -3,7 +3,7 @@ import binascii
 from eth_utils import int_to_big_endian
 from rlp.utils import ALL_BYTES
 
-from trie.constants import NIBBLE_TERMINATOR, hex_to_int, TT256
+from trie.constants import NIBBLE_TERMINATOR, HEX_TO_NIBBLE, TT256
 
 
 def ascii_chr(n):
@@ -44,7 +44,7 @@ def bin_to_nibbles(s):
     >>> bin_to_nibbles("hello")
     [6, 8, 6, 5, 6, 12, 6, 12, 6, 15]
     """
-    return [hex_to_int[c] for c in encode_hex(s)]
+    return list(encode_hex(s).encode().translate(HEX_TO_NIBBLE))
 
 
 def nibbles_to_bin(nibbles):
@@ -54,10 +54,8 @@ def nibbles_to_bin(nibbles):
     if len(nibbles) % 2:
         raise Exception("nibbles must be of even numbers")
 
-    res = b''
-    for i in range(0, len(nibbles), 2):
-        res += ascii_chr(16 * nibbles[i] + nibbles[i + 1])
-    return res
+    return bytes(16 * nibbles[i] + nibbles[i + 1]
+                 for i in range(0, len(nibbles), 2))
 
 
 def with_terminator(nibbles):
@@ -104,7 +102,7 @@ def pack_nibbles(nibbles):
        3        0011    |   terminating (leaf)         odd    
     """
 
-    if nibbles[-1] == NIBBLE_TERMINATOR:
+    if nibbles and nibbles[-1] == NIBBLE_TERMINATOR:
         flags = 2
         nibbles = nibbles[:-1]
     else:
@@ -116,10 +114,8 @@ def pack_nibbles(nibbles):
         nibbles = [flags] + nibbles
     else:
         nibbles = [flags, 0] + nibbles
-    o = b''
-    for i in range(0, len(nibbles), 2):
-        o += ascii_chr(16 * nibbles[i] + nibbles[i + 1])
-    return o
+    return bytes(16 * nibbles[i] + nibbles[i + 1]
+                 for i in range(0, len(nibbles), 2))
 
 
 def unpack_to_nibbles(bindata):
@@ -163,6 +159,21 @@ def starts_with(full, part) -> bool:
     return full[:len(part)] == part
 
 
+def range_position(path, lo, hi):
+    """ position of the keys starting with `path` relative to the range of
+    keys from `lo` to `hi`, all three being lists of nibbles or `NibblePath`s
+    :return: -1 if all the keys are below the range, 1 if all are above it,
+    0 if all are in it and None otherwise
+    """
+    if path < lo[:len(path)]:
+        return -1
+    if path > hi[:len(path)]:
+        return 1
+    if lo <= path < hi[:len(path)]:
+        return 0
+    return None
+
+
 def zpad(x, l):
     """ Left zero pad value `x` at least to length `l`.
     >>> zpad('', 1)